@@ -33,7 +33,7 @@ __author__ = "Jerome Kieffer"
 __contact__ = "Jerome.Kieffer@ESRF.eu"
 __license__ = "MIT"
 __copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
-__date__ = "13/03/2023"
+__date__ = "15/10/2026"
 __satus__ = "production"
 
 import sys
@@ -42,6 +42,7 @@ import numpy
 import os.path
 import collections
 import contextlib
+import concurrent.futures
 from argparse import ArgumentParser
 import logging
 logging.basicConfig(level=logging.INFO)
@@ -51,6 +52,7 @@ try:
     import hdf5plugin  # noqa
 except ImportError:
     logger.debug("Unable to load hdf5plugin, backtrace:", exc_info=True)
+    hdf5plugin = None
 
 import fabio
 
@@ -187,6 +189,61 @@ def get_monitor_value(image, monitor_key):
         return 1.0
 
 
+def get_hdf5_compression(name):
+    """Returns the HDF5 filter options matching a compression name.
+
+    :param str name: Name of the compression: "lz4" for Blosc2 with LZ4 and
+        byte-shuffle, None or empty for no compression
+    :return: Filter options to create the HDF5 datasets, else None
+    """
+    if not name:
+        return None
+    if name != "lz4":
+        logger.warning("HDF5 compression '%s' unsupported. Results are not compressed.", name)
+        return None
+    if hdf5plugin is None:
+        logger.warning("hdf5plugin is not available. Results are not compressed.")
+        return None
+    return hdf5plugin.Blosc2(cname="lz4", clevel=3, filters=hdf5plugin.Blosc2.SHUFFLE)
+
+
+MIN_FILES_TO_LIST_DIRECTORY = 8  # Below this number of inputs, a directory is not listed
+
+
+def list_existing_files(filenames):
+    """Returns the filenames which are existing files.
+
+    Directories containing many of the inputs are listed once instead of
+    issuing one `stat` per file, which is much faster on network file systems
+    with large batches. Few inputs are checked one by one, to not list a huge
+    directory for a single file.
+
+    :param List[str] filenames: Filenames to check
+    :return: Set of the filenames which are existing files
+    :rtype: Set[str]
+    """
+    per_directory = collections.defaultdict(list)
+    for filename in filenames:
+        per_directory[os.path.dirname(filename)].append(filename)
+
+    result = set()
+    for dirname, names in per_directory.items():
+        if len(names) < MIN_FILES_TO_LIST_DIRECTORY:
+            result.update(name for name in names if os.path.isfile(name))
+            continue
+        try:
+            with os.scandir(dirname or ".") as entries:
+                files = {entry.name for entry in entries if entry.is_file()}
+        except OSError:
+            continue
+        for name in names:
+            # Names not found in the listing are checked on the file system,
+            # which may not be case sensitive
+            if os.path.basename(name) in files or os.path.isfile(name):
+                result.add(name)
+    return result
+
+
 class IntegrationObserver(object):
     """Interface providing access to the to the processing of the `process`
     function."""
@@ -314,6 +371,16 @@ class ShellIntegrationObserver(IntegrationObserver):
 DataInfo = collections.namedtuple("DataInfo", "source source_id frame_id fabio_image data_id data header source_filename")
 
 
+def _read_next_frame(frames):
+    """Read the next frame from the frame iterator of a multi-frame image.
+
+    :param frames: Iterator over the frames of the image
+    :return: The frame and its data
+    """
+    fimg = next(frames)
+    return fimg, fimg.data[...]
+
+
 class DataSource(object):
     """Source of data to integrate."""
 
@@ -359,8 +426,14 @@ class DataSource(object):
 
         item = self._items[0]
         if isinstance(item, (str,)):
-            with fabio.open(item) as fabio_image:
-                multiframe = fabio_image.nframes > 1
+            try:
+                with fabio.open(item) as fabio_image:
+                    multiframe = fabio_image.nframes > 1
+            except Exception:
+                if "::" not in item:
+                    raise
+                # Data paths are only validated when read
+                multiframe = False
         elif isinstance(item, fabio.fabioimage.FabioImage):
             fabio_image = item
             multiframe = fabio_image.nframes > 1
@@ -380,8 +453,16 @@ class DataSource(object):
 
     def _iter_item_frames(self, iitem, start_id, item):
         if isinstance(item, (str,)):
-            with self._statistics.time_reading():
-                fabio_image = fabio.open(item)
+            try:
+                with self._statistics.time_reading():
+                    fabio_image = fabio.open(item)
+            except Exception:
+                if "::" not in item:
+                    raise
+                # Data paths are validated here, to open each file only once
+                logger.warning("File %s do not exists. File ignored.", item)
+                self._frames_per_items.append(0)
+                return
             filename = fabio_image.filename
             was_openned = True
         elif isinstance(item, fabio.fabioimage.FabioImage):
@@ -395,19 +476,32 @@ class DataSource(object):
         if fabio_image is not None:
             # TODO: Reach nframes here could slow down the reading
             if fabio_image.nframes > 1:
-                self._frames_per_items.append(fabio_image.nframes)
-                for iframe in range(fabio_image.nframes):
-                    with self._statistics.time_reading():
-                        fimg = fabio_image.getframe(iframe)
-                        data = fimg.data[...]
-                    yield DataInfo(source=item,
-                                   source_id=iitem,
-                                   frame_id=iframe,
-                                   data_id=start_id + iframe,
-                                   data=data,
-                                   fabio_image=fimg,
-                                   header=fimg.header,
-                                   source_filename=filename)
+                nframes = fabio_image.nframes
+                self._frames_per_items.append(nframes)
+                # EDF and HDF5 frames are streamed from the container instead
+                # of being re-indexed with getframe. Other formats provide
+                # bare FabioFrame, which do not give access to the monitor.
+                # The next frame is read in the background while the current
+                # one is processed
+                if isinstance(fabio_image, (fabio.edfimage.EdfImage, fabio.hdf5image.Hdf5Image)):
+                    frames = iter(fabio_image.frames())
+                else:
+                    frames = (fabio_image.getframe(i) for i in range(nframes))
+                with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+                    future = executor.submit(_read_next_frame, frames)
+                    for iframe in range(nframes):
+                        with self._statistics.time_reading():
+                            fimg, data = future.result()
+                        if iframe + 1 < nframes:
+                            future = executor.submit(_read_next_frame, frames)
+                        yield DataInfo(source=item,
+                                       source_id=iitem,
+                                       frame_id=iframe,
+                                       data_id=start_id + iframe,
+                                       data=data,
+                                       fabio_image=fimg,
+                                       header=fimg.header,
+                                       source_filename=filename)
             else:
                 self._frames_per_items.append(1)
                 with self._statistics.time_reading():
@@ -466,8 +560,11 @@ class DataSource(object):
         """
         next_id = 0
         for iitem, item in enumerate(self._items):
+            data_info = None
             for data_info in self._iter_item_frames(iitem, next_id, item):
                 yield data_info
+            if data_info is None:
+                continue
             if data_info.frame_id is not None:
                 next_id += data_info.frame_id
             next_id += 1
@@ -481,6 +578,7 @@ class MultiFileWriter(pyFAI.io.Writer):
         if mode in [HDF5Writer.MODE_OVERWRITE, HDF5Writer.MODE_APPEND]:
             raise ValueError("Mode %s unsupported" % mode)
         self._writer = None
+        self._engine = None
         self._output_path = output_path
         self._mode = mode
 
@@ -516,16 +614,24 @@ class MultiFileWriter(pyFAI.io.Writer):
         if os.path.exists(outpath):
             if self._mode == HDF5Writer.MODE_DELETE:
                 os.unlink(outpath)
-        self._writer = DefaultAiWriter(outpath, engine)
-        self._writer.init(fai_cfg=self._fai_cfg, lima_cfg=self._lima_cfg)
+        if self._writer is not None and self._engine is engine:
+            # Same geometry: only the output file changes
+            self._writer.set_filename(outpath)
+        else:
+            if self._writer is not None:
+                self._writer.close()
+            self._writer = DefaultAiWriter(outpath, engine)
+            self._writer.init(fai_cfg=self._fai_cfg, lima_cfg=self._lima_cfg)
+            self._engine = engine
 
     def write(self, data):
         self._writer.write(data)
-        self._writer.close()
-        self._writer = None
 
     def close(self):
-        pass
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            self._engine = None
 
 
 class Statistics(object):
@@ -614,6 +720,7 @@ def process(input_data, output, config, monitor_name, observer, write_mode=HDF5W
     worker = pyFAI.worker.Worker()
     worker_config = config.copy()
 
+    compression = get_hdf5_compression(worker_config.pop("hdf5_compression", None))
     json_monitor_name = worker_config.pop("monitor_name", None)
     if monitor_name is None:
         monitor_name = json_monitor_name
@@ -635,20 +742,15 @@ def process(input_data, output, config, monitor_name, observer, write_mode=HDF5W
 
     # Skip invalide data
     source = DataSource(statistics=statistics)
+    existing_files = list_existing_files([item for item in input_data if isinstance(item, (str,))])
     for item in input_data:
         if isinstance(item, (str,)):
-            if os.path.isfile(item):
+            if item in existing_files:
                 source.append(item)
             else:
                 if "::" in item:
-                    try:
-                        # Only check that we can open the file
-                        # It's low cost with HDF5
-                        with fabio.open(item):
-                            pass
-                        source.append(item)
-                    except Exception:
-                        logger.warning("File %s do not exists. File ignored.", item)
+                    # The data path is checked when the file is read
+                    source.append(item)
                 else:
                     logger.warning("File %s do not exists. File ignored.", item)
         elif isinstance(item, fabio.fabioimage.FabioImage):
@@ -669,7 +771,8 @@ def process(input_data, output, config, monitor_name, observer, write_mode=HDF5W
         if os.path.isdir(output):
             writer = MultiFileWriter(output, mode=write_mode)
         elif output.endswith(".h5") or output.endswith(".hdf5") or format_ in ("h5", "hdf5"):
-            writer = HDF5Writer(output, hpath=entry_path, append_frames=True, mode=write_mode)
+            writer = HDF5Writer(output, hpath=entry_path, append_frames=True, mode=write_mode,
+                                compression=compression)
         else:
             output_path = os.path.abspath(output)
             writer = MultiFileWriter(output_path, mode=write_mode)
@@ -677,7 +780,8 @@ def process(input_data, output, config, monitor_name, observer, write_mode=HDF5W
         if source.is_single_multiframe():
             basename = os.path.splitext(source.basename())[0]
             output_filename = f"{basename}_{'2d' if worker.do_2D() else '1d'}.h5"
-            writer = HDF5Writer(output_filename, append_frames=True, mode=write_mode)
+            writer = HDF5Writer(output_filename, append_frames=True, mode=write_mode,
+                                compression=compression)
         else:
             output_path = os.path.abspath(".")
             writer = MultiFileWriter(None, mode=write_mode)
@@ -692,42 +796,48 @@ def process(input_data, output, config, monitor_name, observer, write_mode=HDF5W
         writer.close()
         return 1
 
-    # Integrate all the provided frames one by one
-    for data_info in source.frames():
-        logger.debug("Processing %s", item)
-
-        observer.processing_data(data_info,
-                                 approximate_count=source.approximate_count())
+    # Invariants of the loop: most of the time no monitor is defined
+    use_monitor = monitor_name is not None and monitor_name != ""
+    prepare_write = hasattr(writer, "prepare_write")
+    link_input = isinstance(writer, HDF5Writer)
 
-        if data_info.fabio_image is not None:
-            normalization_factor = get_monitor_value(data_info.fabio_image, monitor_name)
-        else:
-            normalization_factor = 1.0
-
-        if hasattr(writer, "prepare_write"):
-            writer.prepare_write(data_info, engine=worker.ai)
-
-        with statistics.time_processing():
-            result = worker.process(data=data_info.data,
-                                    normalization_factor=normalization_factor,
-                                    writer=writer)
-        # Store reference to input data if possible
-        if isinstance(writer, HDF5Writer) and (data_info.fabio_image is not None):
-            fimg = data_info.fabio_image
-            if "dataset" in dir(fimg):
-                if isinstance(fimg.dataset, list):
-                    for ds in  fimg.dataset:
-                        writer.set_hdf5_input_dataset(ds)
-                else:
-                    writer.set_hdf5_input_dataset(fimg.dataset)
+    # Integrate all the provided frames one by one
+    try:
+        for data_info in source.frames():
+            logger.debug("Processing %s", item)
 
-        if observer.is_interruption_requested():
-            break
-        observer.data_result(data_info, result)
-        if observer.is_interruption_requested():
-            break
+            observer.processing_data(data_info,
+                                     approximate_count=source.approximate_count())
 
-    writer.close()
+            if use_monitor and (data_info.fabio_image is not None):
+                normalization_factor = get_monitor_value(data_info.fabio_image, monitor_name)
+            else:
+                normalization_factor = 1.0
+
+            if prepare_write:
+                writer.prepare_write(data_info, engine=worker.ai)
+
+            with statistics.time_processing():
+                result = worker.process(data=data_info.data,
+                                        normalization_factor=normalization_factor,
+                                        writer=writer)
+            # Store reference to input data if possible
+            if link_input and (data_info.fabio_image is not None):
+                fimg = data_info.fabio_image
+                if "dataset" in dir(fimg):
+                    if isinstance(fimg.dataset, list):
+                        for ds in  fimg.dataset:
+                            writer.set_hdf5_input_dataset(ds)
+                    else:
+                        writer.set_hdf5_input_dataset(fimg.dataset)
+
+            if observer.is_interruption_requested():
+                break
+            observer.data_result(data_info, result)
+            if observer.is_interruption_requested():
+                break
+    finally:
+        writer.close()
 
     if observer.is_interruption_requested():
         logger.error("Processing was aborted")
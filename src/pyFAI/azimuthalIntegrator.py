@@ -30,7 +30,7 @@ __author__ = "Jérôme Kieffer"
 __contact__ = "Jerome.Kieffer@ESRF.eu"
 __license__ = "MIT"
 __copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
-__date__ = "21/11/2023"
+__date__ = "15/10/2026"
 __status__ = "stable"
 __docformat__ = 'restructuredtext'
 
@@ -1659,15 +1659,16 @@ class AzimuthalIntegrator(Geometry):
         count = res.count.sum(axis=-1)
         sum_normalization = res._sum_normalization.sum(axis=-1)
 
-        mask = numpy.where(count == 0)
+        valid = count != 0
         empty = dummy if dummy is not None else self._empty
-        intensity = sum_signal / sum_normalization
-        intensity[mask] = empty
+        intensity = numpy.full_like(sum_signal, empty)
+        numpy.divide(sum_signal, sum_normalization, out=intensity, where=valid)
 
         if res.sigma is not None:
             sum_variance = res.sum_variance.sum(axis=-1)
-            sigma = numpy.sqrt(sum_variance) / sum_normalization
-            sigma[mask] = empty
+            sigma = numpy.full_like(sum_variance, empty)
+            numpy.sqrt(sum_variance, out=sigma, where=valid)
+            numpy.divide(sigma, sum_normalization, out=sigma, where=valid)
         else:
             sum_variance = None
             sigma = None
@@ -31,7 +31,7 @@ __authors__ = ["Aurore Deschildre", "Jérôme Kieffer"]
 __contact__ = "Jerome.Kieffer@ESRF.eu"
 __license__ = "MIT"
 __copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
-__date__ = "10/10/2023"
+__date__ = "15/10/2026"
 __status__ = "production"
 __docformat__ = 'restructuredtext'
 
@@ -40,12 +40,16 @@ from math import sqrt
 import logging
 
 import numpy
+from numpy.lib.stride_tricks import sliding_window_view
 logger = logging.getLogger(__name__)
 try:
     from .ext._convolution import gaussian_filter
+    pyFAI_convolution = True
 except ImportError:
     logger.debug("Backtrace", exc_info=True)
     from scipy.ndimage.filters import gaussian_filter
+    pyFAI_convolution = False
+from scipy.ndimage import maximum_filter
 try:
     from .ext import _blob
 except ImportError:
@@ -63,18 +67,37 @@ except ImportError:
 from .ext.bilinear import Bilinear
 
 
-from .utils import binning, is_far_from_group
+from .utils import is_far_from_group
+
+
+# Savitzky-Golay kernels on a 3x3 patch (order 2), one line per kernel:
+# dx (SGX1Y0), dy (SGX0Y1), d2x (SGX2Y0), d2y (SGX0Y2), dxy (SGX1Y1) and smoothing (SGX0Y0)
+SG_KERNELS = numpy.array([[-0.16666667, 0.00000000, 0.16666667, -0.16666667, 0.00000000, 0.16666667, -0.16666667, 0.00000000, 0.16666667],
+                          [-0.16666667, -0.16666667, -0.16666667, 0.00000000, 0.00000000, 0.00000000, 0.16666667, 0.16666667, 0.16666667],
+                          [0.16666667, -0.33333333, 0.16666667, 0.16666667, -0.33333333, 0.16666667, 0.16666667, -0.33333333, 0.16666667],
+                          [0.16666667, 0.16666667, 0.16666667, -0.33333333, -0.33333333, -0.33333333, 0.16666667, 0.16666667, 0.16666667],
+                          [0.25000000, 0.00000000, -0.25000000, 0.00000000, 0.00000000, 0.00000000, -0.25000000, 0.00000000, 0.25000000],
+                          [-0.11111111, 0.22222222, -0.11111111, 0.22222222, 0.55555556, 0.22222222, -0.11111111, 0.22222222, -0.11111111]],
+                         dtype=numpy.float32)
+
+
+def _neighborhood(size):
+    """Footprint of the in-plane neighborhood of a pixel, without the pixel itself"""
+    footprint = numpy.ones((size, size), dtype=bool)
+    footprint[size // 2, size // 2] = False
+    footprint.flags.writeable = False
+    return footprint
+
+
+NEIGHBORHOODS = {3: _neighborhood(3), 5: _neighborhood(5)}
 
 
 def image_test():
     img = numpy.zeros((128 * 4, 128 * 4))
     a = numpy.linspace(0.5, 8, 16)
-    xc = [64, 64, 64, 64, 192, 192, 192, 192, 320, 320, 320, 320, 448, 448, 448, 448]
-    yc = [64, 192, 320, 448, 64, 192, 320, 448, 64, 192, 320, 448, 64, 192, 320, 448]
-    cpt = 0
-    for sigma in a:
-        img = make_gaussian(img, sigma, xc[cpt], yc[cpt])
-        cpt = cpt + 1
+    xc, yc = numpy.meshgrid([64, 192, 320, 448], [64, 192, 320, 448], indexing="ij")
+    for sigma, x, y in zip(a, xc.ravel(), yc.ravel()):
+        img = make_gaussian(img, sigma, x, y)
     return img
 
 
@@ -82,11 +105,10 @@ def make_gaussian(im, sigma, xc, yc):
     size = int(8 * sigma + 1)
     if size % 2 == 0:
         size += 1
-    x = numpy.arange(0, size, 1, float)
-    y = x[:, numpy.newaxis] * 4
-    x0 = y0 = size // 2
-    gaus = numpy.exp(-4 * numpy.log(2) * ((x - x0) ** 2 + (y - y0) ** 2) / sigma ** 2)
-    im[xc - size / 2:xc + size / 2 + 1, yc - size / 2:yc + size / 2 + 1] = gaus
+    half = size // 2
+    # the gaussian is separable: outer product of the 1D profile
+    profile = numpy.exp(-4 * numpy.log(2) * numpy.arange(-half, half + 1) ** 2 / sigma ** 2)
+    im[xc - half:xc + half + 1, yc - half:yc + half + 1] = numpy.outer(profile, profile)
     return im
 
 
@@ -99,72 +121,24 @@ def local_max(dogs, mask=None, n_5=True):
     if mask is not None:
         mask = mask.astype(bool)
     ns = dogs.shape[0]
-    kpma = numpy.zeros(shape=dogs.shape, dtype=numpy.uint8)
+    kpma = numpy.zeros(shape=dogs.shape, dtype=bool)
+    footprint = NEIGHBORHOODS[5 if n_5 else 3]
+    # Pixels whose neighborhood exceeds the image are rejected thanks to the +inf padding.
+    neighbors = [maximum_filter(dog, footprint=footprint, mode="constant", cval=numpy.inf)
+                 for dog in dogs]
+    # comparisons are written in a scratch buffer and and-ed in place: no temporary
+    buf = numpy.empty(dogs.shape[1:], dtype=bool)
     for i in range(1, ns - 1):
         cur_dog = dogs[i]
-        next_dog = dogs[i + 1]
-        prev_dog = dogs[i - 1]
-        slic = cur_dog[1:-1, 1:-1]
         kpm = kpma[i]
-        kpm[1:-1, 1:-1] += (slic > cur_dog[:-2, 1:-1]) * (slic > cur_dog[2:, 1:-1])
-        kpm[1:-1, 1:-1] += (slic > cur_dog[1:-1, :-2]) * (slic > cur_dog[1:-1, 2:])
-        kpm[1:-1, 1:-1] += (slic > cur_dog[:-2, :-2]) * (slic > cur_dog[2:, 2:])
-        kpm[1:-1, 1:-1] += (slic > cur_dog[2:, :-2]) * (slic > cur_dog[:-2, 2:])
-
-        # with next DoG
-        kpm[1:-1, 1:-1] += (slic > next_dog[:-2, 1:-1]) * (slic > next_dog[2:, 1:-1])
-        kpm[1:-1, 1:-1] += (slic > next_dog[1:-1, :-2]) * (slic > next_dog[1:-1, 2:])
-        kpm[1:-1, 1:-1] += (slic > next_dog[:-2, :-2]) * (slic > next_dog[2:, 2:])
-        kpm[1:-1, 1:-1] += (slic > next_dog[2:, :-2]) * (slic > next_dog[:-2, 2:])
-        kpm[1:-1, 1:-1] += (slic >= next_dog[1:-1, 1:-1])
-
-        # with previous DoG
-        kpm[1:-1, 1:-1] += (slic > prev_dog[:-2, 1:-1]) * (slic > prev_dog[2:, 1:-1])
-        kpm[1:-1, 1:-1] += (slic > prev_dog[1:-1, :-2]) * (slic > prev_dog[1:-1, 2:])
-        kpm[1:-1, 1:-1] += (slic > prev_dog[:-2, :-2]) * (slic > prev_dog[2:, 2:])
-        kpm[1:-1, 1:-1] += (slic > prev_dog[2:, :-2]) * (slic > prev_dog[:-2, 2:])
-        kpm[1:-1, 1:-1] += (slic >= prev_dog[1:-1, 1:-1])
-
-        if n_5:
-            target = 38
-            slic = cur_dog[2:-2, 2:-2]
-
-            kpm[2:-2, 2:-2] += (slic > cur_dog[:-4, 2:-2]) * (slic > cur_dog[4:, 2:-2])  # decalage horizontal
-            kpm[2:-2, 2:-2] += (slic > cur_dog[2:-2, :-4]) * (slic > cur_dog[2:-2, 4:])  # decalage vertical
-            kpm[2:-2, 2:-2] += (slic > cur_dog[:-4, :-4]) * (slic > cur_dog[4:, 4:])  # diagonale
-            kpm[2:-2, 2:-2] += (slic > cur_dog[4:, :-4]) * (slic > cur_dog[:-4, 4:])
-            kpm[2:-2, 2:-2] += (slic > cur_dog[4:, 1:-3]) * (slic > cur_dog[:-4, 1:-3])
-            kpm[2:-2, 2:-2] += (slic > cur_dog[1:-3, :-4]) * (slic > cur_dog[1:-3, 4:])
-            kpm[2:-2, 2:-2] += (slic > cur_dog[3:-1, :-4]) * (slic > cur_dog[3:-1, 4:])
-            kpm[2:-2, 2:-2] += (slic > cur_dog[4:, 3:-1]) * (slic > cur_dog[:-4, 3:-1])
-
-            # with next DoG
-            kpm[2:-2, 2:-2] += (slic > next_dog[:-4, 2:-2]) * (slic > next_dog[4:, 2:-2])
-            kpm[2:-2, 2:-2] += (slic > next_dog[2:-2, :-4]) * (slic > next_dog[2:-2, 4:])
-            kpm[2:-2, 2:-2] += (slic > next_dog[:-4, :-4]) * (slic > next_dog[4:, 4:])
-            kpm[2:-2, 2:-2] += (slic > next_dog[4:, :-4]) * (slic > next_dog[:-4, 4:])
-            kpm[2:-2, 2:-2] += (slic > next_dog[4:, 1:-3]) * (slic > next_dog[:-4, 1:-3])
-            kpm[2:-2, 2:-2] += (slic > next_dog[1:-3, :-4]) * (slic > next_dog[1:-3, 4:])
-            kpm[2:-2, 2:-2] += (slic > next_dog[3:-1, :-4]) * (slic > next_dog[3:-1, 4:])
-            kpm[2:-2, 2:-2] += (slic > next_dog[4:, 3:-1]) * (slic > next_dog[:-4, 3:-1])
-
-            # with previous DoG
-            kpm[2:-2, 2:-2] += (slic > prev_dog[:-4, 2:-2]) * (slic > prev_dog[4:, 2:-2])
-            kpm[2:-2, 2:-2] += (slic > prev_dog[2:-2, :-4]) * (slic > prev_dog[2:-2, 4:])
-            kpm[2:-2, 2:-2] += (slic > prev_dog[:-4, :-4]) * (slic > prev_dog[4:, 4:])
-            kpm[2:-2, 2:-2] += (slic > prev_dog[4:, :-4]) * (slic > prev_dog[:-4, 4:])
-            kpm[2:-2, 2:-2] += (slic > prev_dog[4:, 1:-3]) * (slic > prev_dog[:-4, 1:-3])
-            kpm[2:-2, 2:-2] += (slic > prev_dog[1:-3, :-4]) * (slic > prev_dog[1:-3, 4:])
-            kpm[2:-2, 2:-2] += (slic > prev_dog[3:-1, :-4]) * (slic > prev_dog[3:-1, 4:])
-            kpm[2:-2, 2:-2] += (slic > prev_dog[4:, 3:-1]) * (slic > prev_dog[:-4, 3:-1])
-
-        else:
-            target = 14
-
+        numpy.greater(cur_dog, neighbors[i], out=kpm)
+        kpm &= numpy.greater(cur_dog, neighbors[i - 1], out=buf)
+        kpm &= numpy.greater(cur_dog, neighbors[i + 1], out=buf)
+        kpm &= numpy.greater_equal(cur_dog, dogs[i - 1], out=buf)
+        kpm &= numpy.greater_equal(cur_dog, dogs[i + 1], out=buf)
         if mask is not None:
-            kpm[mask] = 0
-
-    return kpma == target
+            kpm[mask] = False
+    return kpma
 
 
 class BlobDetection(object):
@@ -176,7 +150,8 @@ class BlobDetection(object):
     """
     tresh = 0.6
 
-    def __init__(self, img, cur_sigma=0.25, init_sigma=0.5, dest_sigma=1, scale_per_octave=2, mask=None):
+    def __init__(self, img, cur_sigma=0.25, init_sigma=0.5, dest_sigma=1, scale_per_octave=2, mask=None,
+                 use_opencl=False):
         """
         Performs a blob detection:
         http://en.wikipedia.org/wiki/Blob_detection
@@ -188,6 +163,7 @@ class BlobDetection(object):
         :param dest_sigma: sigma at which the resolution is lowered (change of octave)
         :param scale_per_octave: Number of scale to be performed per octave
         :param mask: mask where pixel are not valid
+        :param use_opencl: search for local maxima with OpenCL (needs pyopencl)
         """
         # self.raw = numpy.log(img.astype(numpy.float32))
         self.raw = img.astype(numpy.float32)
@@ -202,7 +178,7 @@ class BlobDetection(object):
         self.grow = None
         self.data = None  # current image
         self.sigmas = None  # contains pairs of absolute sigma and relative ones...
-        self.blurs = []  # different blurred images
+        self.blurs = []  # blurred image used to build the next octave
         self.dogs = []  # different difference of gaussians
         self.dogs_init = []
         self.border_size = 5  # size of the border, unused: prefer mask
@@ -216,6 +192,8 @@ class BlobDetection(object):
         self.dtype = numpy.dtype([('x', numpy.float32), ('y', numpy.float32), ('sigma', numpy.float32), ('I', numpy.float32)])
         self.bilinear = None
         self.already_blurred = []
+        self.use_opencl = bool(use_opencl)
+        self._ocl_local_max = {}  # one OpenCL local maximum search per shape of DoG stack
 
     def __repr__(self):
         lststr = ["Blob detection, shape=%s, processed=%s." % (self.raw.shape, self.detection_started)]
@@ -281,6 +259,24 @@ class BlobDetection(object):
             previous = sigma_abs
         logger.debug("Sigma= %s", self.sigmas)
 
+    def _get_ocl_local_max(self, shape):
+        """
+        Return the OpenCL local maximum search for a stack of DoG of this shape
+
+        :param shape: shape of the stack of DoG: (scale, y, x)
+        :return: OCL_LocalMax instance or None if OpenCL is not usable
+        """
+        if shape not in self._ocl_local_max:
+            try:
+                from .opencl.blob import OCL_LocalMax
+                self._ocl_local_max[shape] = OCL_LocalMax(shape)
+            except Exception as err:
+                logger.warning("OpenCL local maximum search is not available, falling back on CPU: %s: %s",
+                               type(err).__name__, err)
+                self.use_opencl = False
+                return None
+        return self._ocl_local_max[shape]
+
     def _one_octave(self, shrink=True, refine=True, n_5=False):
         """
         Return the blob coordinates for an octave
@@ -301,26 +297,32 @@ class BlobDetection(object):
         dog_shape = (len(self.sigmas) - 1,) + self.data.shape
         self.dogs = numpy.zeros(dog_shape, dtype=numpy.float32)
 
+        # Blurs are computed alternatively in two scratch buffers,
+        # only the one needed to build the next octave is retained.
+        # A third one holds the horizontal pass of the convolution.
+        buffers = numpy.empty((2,) + self.data.shape, dtype=numpy.float32)
+        tmp = numpy.empty(self.data.shape, dtype=numpy.float32)
+        self.blurs = []
         idx = 0
-        i = 0
-        for _sigma_abs, sigma_rel in self.sigmas:
-            # if self.already_blurred != [] and i < 3:
-            #    sigma_rel = 0
-            #    if i > 0: previous = self.already_blurred[i-1]
-            if sigma_rel == 0:
-                self.blurs.append(previous)
-            else:
-                new_blur = gaussian_filter(previous, sigma_rel)
-                self.blurs.append(new_blur)
-                self.dogs[idx] = previous - new_blur
+        for i, (_sigma_abs, sigma_rel) in enumerate(self.sigmas):
+            if sigma_rel != 0:
+                if pyFAI_convolution:
+                    new_blur = gaussian_filter(previous, sigma_rel, output=buffers[idx % 2], tmp=tmp)
+                else:
+                    new_blur = gaussian_filter(previous, sigma_rel, output=buffers[idx % 2])
+                numpy.subtract(previous, new_blur, out=self.dogs[idx])
                 previous = new_blur
                 idx += 1
-            i += 1
+            if i == self.scale_per_octave:
+                self.blurs.append(previous.copy())
 
         if self.dogs[0].shape == self.raw.shape:
             self.dogs_init = self.dogs
 
-        if _blob:
+        ocl_local_max = self._get_ocl_local_max(self.dogs.shape) if self.use_opencl else None
+        if ocl_local_max is not None:
+            valid_points = ocl_local_max.local_max(self.dogs, self.cur_mask, n_5)
+        elif _blob:
             valid_points = _blob.local_max(self.dogs, self.cur_mask, n_5)
         else:
             valid_points = local_max(self.dogs, self.cur_mask, n_5)
@@ -330,34 +332,32 @@ class BlobDetection(object):
         if refine:
             if "startswith" in dir(refine) and refine.startswith("SG"):
                 kpx, kpy, kps, _delta_s = self.refine_Hessian_SG(kpx, kpy, kps)
-                l = kpx.size
-                peak_val = self.dogs[(numpy.around(kps).astype(int),
-                                      numpy.around(kpy).astype(int),
-                                      numpy.around(kpx).astype(int))]
-                valid = numpy.ones(l, dtype=bool)
+                index = numpy.ravel_multi_index((numpy.around(kps).astype(int),
+                                                 numpy.around(kpy).astype(int),
+                                                 numpy.around(kpx).astype(int)),
+                                                self.dogs.shape)
+                peak_val = self.dogs.take(index)
             else:
                 kpx, kpy, kps, peak_val, valid = self.refine_Hessian(kpx, kpy, kps)
-                l = valid.sum()
                 self.ref_kp.append((kps, kpy, kpx))
-            print('After refinement : %i keypoints' % l)
+                kpx, kpy, kps, peak_val = kpx[valid], kpy[valid], kps[valid], peak_val[valid]
+            print('After refinement : %i keypoints' % kpx.size)
         else:
-            peak_val = self.dogs[kps, kpy, kpx]
-            l = kpx.size
-            valid = numpy.ones(l, bool)
-
-        keypoints = numpy.recarray((l,), dtype=self.dtype)
+            peak_val = self.dogs.take(numpy.ravel_multi_index((kps, kpy, kpx), self.dogs.shape))
 
-        if l != 0:
-            keypoints[:].x = (kpx[valid] + 0.5) * self.curr_reduction - 0.5  # Place ourselves at the center of the pixel, and back
-            keypoints[:].y = (kpy[valid] + 0.5) * self.curr_reduction - 0.5  # Place ourselves at the center of the pixel, and back
-            sigmas = self.init_sigma * (self.dest_sigma / self.init_sigma) ** ((kps[valid]) / (self.scale_per_octave))
-            keypoints[:].sigma = (self.curr_reduction * sigmas)
-            keypoints[:].I = peak_val[valid]
+        l = kpx.size
+        sigmas = self.init_sigma * (self.dest_sigma / self.init_sigma) ** (kps / self.scale_per_octave)
+        # Place ourselves at the center of the pixel, and back
+        keypoints = numpy.rec.fromarrays(((kpx + 0.5) * self.curr_reduction - 0.5,
+                                          (kpy + 0.5) * self.curr_reduction - 0.5,
+                                          self.curr_reduction * sigmas,
+                                          peak_val),
+                                         dtype=self.dtype)
 
         if shrink:
             # shrink data so that they can be treated by next octave
             logger.debug("In shrink")
-            last = self.blurs[self.scale_per_octave]
+            last = self.blurs[-1]
             ty, tx = last.shape
             if ty % 2 != 0 or tx % 2 != 0:
                 new_tx = 2 * ((tx + 1) // 2)
@@ -369,23 +369,20 @@ class BlobDetection(object):
                     new_msk = numpy.ones((new_ty, new_tx), numpy.int8)
                     new_msk[:ty, :tx] = self.cur_mask
                     self.cur_mask = new_msk
-            self.data = binning(last, 2) / 4.0
+            # 2x2 average, on strided views: keeps float32 and avoids a generic binning
+            self.data = 0.25 * (last[0::2, 0::2] + last[1::2, 0::2] + last[0::2, 1::2] + last[1::2, 1::2])
             self.curr_reduction *= 2.0
             self.octave += 1
             self.blurs = []
             if self.do_mask:
-                self.cur_mask = (binning(self.cur_mask, 2) > 0).astype(numpy.int8)
+                my, mx = self.cur_mask.shape
+                self.cur_mask = self.cur_mask.reshape(my // 2, 2, mx // 2, 2).any(axis=(1, 3)).astype(numpy.int8)
                 self.cur_mask = morphology.binary_dilation(self.cur_mask, self.grow)
 
         if len(self.keypoints) == 0:
             self.keypoints = keypoints
-        else:
-            old_size = self.keypoints.size
-            new_size = old_size + l
-            new_keypoints = numpy.recarray(new_size, dtype=self.dtype)
-            new_keypoints[:old_size] = self.keypoints
-            new_keypoints[old_size:] = keypoints
-            self.keypoints = new_keypoints
+        elif l:
+            self.keypoints = numpy.concatenate((self.keypoints, keypoints)).view(numpy.recarray)
 
     def refine_Hessian(self, kpx, kpy, kps):
         """
@@ -457,77 +454,39 @@ class BlobDetection(object):
         :return: array of corrected keypoints
 
         """
-
-        k2x = []
-        k2y = []
-        sigmas = []
-        kds = []
-
-        # Hessian patch 3 ordre 2
-        SGX0Y0 = [-0.11111111, 0.22222222, -0.11111111, 0.22222222, 0.55555556, 0.22222222, -0.11111111, 0.22222222, -0.11111111]
-        SGX1Y0 = [-0.16666667, 0.00000000, 0.16666667, -0.16666667, 0.00000000, 0.16666667, -0.16666667, 0.00000000, 0.16666667]
-        SGX2Y0 = [0.16666667, -0.33333333, 0.16666667, 0.16666667, -0.33333333, 0.16666667, 0.16666667, -0.33333333, 0.16666667]
-        SGX0Y1 = [-0.16666667, -0.16666667, -0.16666667, 0.00000000, 0.00000000, 0.00000000, 0.16666667, 0.16666667, 0.16666667]
-        SGX1Y1 = [0.25000000, 0.00000000, -0.25000000, 0.00000000, 0.00000000, 0.00000000, -0.25000000, 0.00000000, 0.25000000]
-        SGX0Y2 = [0.16666667, 0.16666667, 0.16666667, -0.33333333, -0.33333333, -0.33333333, 0.16666667, 0.16666667, 0.16666667]
-
-        # SGX0Y0 = [0.0,0.0,0.0,0.0,1.0,0.0,0.0,0.0,0.0]
-        # SGX1Y0 = [0.0,0.0,0.0,-0.5,0.0,0.5,0.0,0.0,0.0]
-        # SGX2Y0 = [0.0,0.0,0.0,0.33333333,-0.66666667,0.33333333,0.0,0.0,0.0]
-        # SGX0Y1 = [0.0,-0.5,0.0,0.0,0.0,0.0,0.0,0.5,0.0]
-        # SGX0Y2 = [0.0, 0.33333333 , 0.0 , 0.0 , -0.66666667,0.0, 0.0 , 0.33333333 , 0.0]
-
-        for y, x, sigma in zip(kpy, kpx, kps):
-
-            curr_dog = self.dogs[sigma]
-            prev_dog = self.dogs[sigma - 1]
-            next_dog = self.dogs[sigma + 1]
-
-            # if (x > 1 and x < curr_dog.shape[1] - 2 and y > 1 and y < curr_dog.shape[0] - 2):
-
-            patch3 = curr_dog[y - 1:y + 2, x - 1:x + 2]
-            patch3_prev = prev_dog[y - 1:y + 2, x - 1:x + 2]
-            patch3_next = next_dog[y - 1:y + 2, x - 1:x + 2]
-
-            dx = (SGX1Y0 * patch3.ravel()).sum()
-            dy = (SGX0Y1 * patch3.ravel()).sum()
-            d2x = (SGX2Y0 * patch3.ravel()).sum()
-            d2y = (SGX0Y2 * patch3.ravel()).sum()
-            dxy = (SGX1Y1 * patch3.ravel()).sum()
-
-            s_next = (SGX0Y0 * patch3_next.ravel()).sum()
-            s = (SGX0Y0 * patch3.ravel()).sum()
-            s_prev = (SGX0Y0 * patch3_prev.ravel()).sum()
-            d2s = (s_next + s_prev - 2.0 * s)
-            ds = (s_next - s_prev) / 2.0
-
-            dx_next = (SGX1Y0 * patch3_next.ravel()).sum()
-            dx_prev = (SGX1Y0 * patch3_prev.ravel()).sum()
-
-            dy_next = (SGX0Y1 * patch3_next.ravel()).sum()
-            dy_prev = (SGX0Y1 * patch3_prev.ravel()).sum()
-
-            dxs = (dx_next - dx_prev) / 2.0
-            dys = (dy_next - dy_prev) / 2.0
-
-            # print(dx, dy, ds)
-            # print(d2x, d2y, d2s, dxy, dxs, dys)
-
-            lap = numpy.array([[d2y, dxy, dys], [dxy, d2x, dxs], [dys, dxs, d2s]])
-            delta = -(numpy.dot(numpy.linalg.inv(lap), [dy, dx, ds]))
-            # print(y, x)
-            # print(delta)
-            # err = numpy.linalg.norm(delta[:-1])
-
-            if numpy.abs(delta[0]) <= self.tresh and numpy.abs(delta[1]) <= self.tresh and numpy.abs(delta[2]) <= self.tresh:
-                k2x.append(x + delta[1])
-                k2y.append(y + delta[0])
-                sigmas.append(sigma + delta[2])
-                # kds.append(delta[2])
-                # kdx.append(delta[1])
-                # kdy.append(delta[0])
-
-        return numpy.asarray(k2x), numpy.asarray(k2y), numpy.asarray(sigmas), numpy.asarray(kds)
+        kpx = numpy.asarray(kpx)
+        kpy = numpy.asarray(kpy)
+        kps = numpy.asarray(kps)
+
+        # 3x3 patches of the previous, current and next DoG around each keypoint
+        windows = sliding_window_view(self.dogs, (3, 3), axis=(1, 2))
+        patches = windows[kps[:, None] + numpy.arange(-1, 2), (kpy - 1)[:, None], (kpx - 1)[:, None]]
+        sg_prev, sg_curr, sg_next = patches.reshape(-1, 3, 9).dot(SG_KERNELS.T).transpose(1, 0, 2)
+
+        dx, dy, d2x, d2y, dxy, s = sg_curr.T
+        s_next = sg_next[:, 5]
+        s_prev = sg_prev[:, 5]
+        d2s = (s_next + s_prev - 2.0 * s)
+        ds = (s_next - s_prev) / 2.0
+        dxs = (sg_next[:, 0] - sg_prev[:, 0]) / 2.0
+        dys = (sg_next[:, 1] - sg_prev[:, 1]) / 2.0
+
+        lap = numpy.empty((kpx.size, 3, 3), dtype=self.dogs.dtype)
+        lap[:, 0, 0] = d2y
+        lap[:, 0, 1] = lap[:, 1, 0] = dxy
+        lap[:, 0, 2] = lap[:, 2, 0] = dys
+        lap[:, 1, 1] = d2x
+        lap[:, 1, 2] = lap[:, 2, 1] = dxs
+        lap[:, 2, 2] = d2s
+        grad = numpy.stack((dy, dx, ds), axis=-1)
+        delta = -numpy.linalg.solve(lap, grad[..., None])[..., 0]
+
+        valid = (abs(delta) <= self.tresh).all(axis=-1)
+        k2y = kpy[valid] + delta[valid, 0]
+        k2x = kpx[valid] + delta[valid, 1]
+        sigmas = kps[valid] + delta[valid, 2]
+        kds = numpy.array([])
+        return k2x, k2y, sigmas, kds
 
     def direction(self):
         """
@@ -623,7 +582,8 @@ class BlobDetection(object):
         # rot2 = -0.07476
         # rot3 = 0.00000005
 
-        valy, valx = numpy.transpose(vect)[0]
+        vect = numpy.asarray(vect)
+        valy, valx = vect[:, 0, 0], vect[:, 1, 0]
         phi_exp = arctan2(valy, valx) % pi
         # print "phi exp"
         # print phi_exp * 180/ pi
@@ -31,14 +31,17 @@ __author__ = "Jérôme Kieffer"
 __contact__ = "Jerome.Kieffer@ESRF.eu"
 __license__ = "MIT"
 __copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
-__date__ = "28/08/2023"
+__date__ = "15/10/2026"
 __status__ = "development"
 __docformat__ = 'restructuredtext'
 
 import os
+import re
 import time
 import collections
+import concurrent.futures
 import glob
+import itertools
 from argparse import ArgumentParser
 from urllib.parse import urlparse
 import logging
@@ -52,10 +55,61 @@ from . import version as PyFAI_VERSION, date as PyFAI_DATE, load
 from .io import Nexus, get_isotime, h5py
 from .worker import Worker, _reduce_images
 
-DIGITS = [str(i) for i in range(10)]
+DIGITS = [str(i) for i in range(10)]  # kept for compatibility, the parsing uses DIGITS_RE
+DIGITS_RE = re.compile("[0-9]+")
 Position = collections.namedtuple('Position', 'index, rot, trans')
 
 
+def _url_path(url):
+    """Return the path part of an URL, without parsing plain filenames
+
+    :param url: URL or filename
+    :return: the path
+    """
+    if url.startswith("//") or any(c in url for c in ":;?#"):
+        return urlparse(url).path
+    return url
+
+
+def _write_row(dataset, row, buffer, start, stop):
+    """Write the part [start:stop] of a row of results into a dataset
+
+    Complete rows are written as raw chunks, bypassing the chunk cache and
+    the filter pipeline, when the chunking of the dataset allows it.
+
+    :param dataset: h5py dataset of shape (slow, fast, ...)
+    :param row: index in the slow dimension
+    :param buffer: array of shape (fast, ...) with the results
+    :param start: first index in the fast dimension
+    :param stop: last index in the fast dimension (excluded)
+    """
+    chunks = dataset.chunks
+    if (start == 0 and stop == len(buffer) and
+            chunks is not None and chunks[0] == 1 and chunks[2:] == buffer.shape[1:] and
+            buffer.dtype == dataset.dtype and
+            dataset.id.get_create_plist().get_nfilters() == 0):
+        offset = (0,) * (dataset.ndim - 2)
+        if chunks[1] == stop:
+            dataset.id.write_direct_chunk((row, 0) + offset, buffer.tobytes())
+            return
+        if chunks[1] == 1:
+            for fast in range(stop):
+                dataset.id.write_direct_chunk((row, fast) + offset, buffer[fast].tobytes())
+            return
+    dataset[row, start:stop] = buffer[start:stop]
+
+
+def _open_image(filename):
+    """Open an image with fabio and read its (first) frame
+
+    :param filename: name of the file
+    :return: fabio image
+    """
+    fimg = fabio.open(filename)
+    fimg.data
+    return fimg
+
+
 class DiffMap(object):
     """
     Basic class for diffraction mapping experiment using pyFAI
@@ -88,14 +142,21 @@ class DiffMap(object):
         self.dataset = None
         self.dataset_error = None
         self.inputfiles = []
+        self._file_index = {}  # filename -> index in inputfiles
         self.timing = []
         self.stats = False
         self._idx = -1
         self.processed_file = []
         self.stored_input = set()
+        self._row = None  # index of the slow row pending in the buffers
+        self._row_start = 0  # first fast index pending in the buffers
+        self._row_stop = 0  # last fast index pending in the buffers, excluded
+        self._row_buffer = None
+        self._row_error = None
         self.nxs = None
         self.entry_grp = None
         self.experiment_title = "Diffraction Mapping"
+        self.output_dtype = "float32"  # floating point type of the stored results
 
     def __repr__(self):
         return "%s experiment with ntp_slow: %s ntp_fast: %s, npt_diff: %s" % \
@@ -111,15 +172,7 @@ class DiffMap(object):
 
         :param name: input string, often a filename
         """
-        res = []
-        cur = ""
-        for c in name:
-            if c in DIGITS:
-                cur = cur + c
-            elif cur:
-                res.append(cur)
-                cur = ""
-        return tuple(int(i) for i in res)
+        return tuple(int(i) for i in DIGITS_RE.findall(name))
 
     def parse(self, with_config=False):
         """
@@ -214,6 +267,8 @@ If the number of files is too large, use double quotes like "*.edf" """
             config["ai"] = ai
         if "output_file" in config:
             self.hdf5 = config["output_file"]
+        if "output_dtype" in config:
+            self.output_dtype = config["output_dtype"]
 
         if options.verbose:
             logger.setLevel(logging.DEBUG)
@@ -221,9 +276,8 @@ If the number of files is too large, use double quotes like "*.edf" """
             self.hdf5 = options.outfile
             config["output_file"] = self.hdf5,
         if options.dark:
-            dark_files = [os.path.abspath(urlparse(f).path)
-                          for f in options.dark.split(",")
-                          if os.path.isfile(urlparse(f).path)]
+            dark_files = [os.path.abspath(f) for f in map(_url_path, options.dark.split(","))
+                          if os.path.isfile(f)]
             if dark_files:
                 self.dark = dark_files
                 ai["dark_current"] = ",".join(dark_files)
@@ -232,9 +286,8 @@ If the number of files is too large, use double quotes like "*.edf" """
                 raise RuntimeError("No such dark files")
 
         if options.flat:
-            flat_files = [os.path.abspath(urlparse(f).path)
-                          for f in options.flat.split(",")
-                          if os.path.isfile(urlparse(f).path)]
+            flat_files = [os.path.abspath(f) for f in map(_url_path, options.flat.split(","))
+                          if os.path.isfile(f)]
             if flat_files:
                 self.flat = flat_files
                 ai["flat_field"] = ",".join(flat_files)
@@ -247,18 +300,21 @@ If the number of files is too large, use double quotes like "*.edf" """
             ai["method"] = ["full", "csr", "opencl"]
 
         for fn in args:
-            f = urlparse(fn).path
+            f = _url_path(fn)
             if os.path.isfile(f) and f.endswith(options.extension):
                 self.inputfiles.append(os.path.abspath(f))
             elif os.path.isdir(f):
-                self.inputfiles += [os.path.abspath(os.path.join(f, g)) for g in os.listdir(f) if g.endswith(options.extension) and g.startswith(options.prefix)]
+                dirname = os.path.abspath(f)
+                with os.scandir(dirname) as entries:
+                    self.inputfiles += [os.path.join(dirname, e.name) for e in entries
+                                        if e.name.endswith(options.extension) and e.name.startswith(options.prefix) and e.is_file()]
             else:
-                self.inputfiles += [os.path.abspath(f) for f in glob.glob(f)]
+                self.inputfiles.extend(os.path.abspath(g) for g in glob.iglob(f))
         self.inputfiles.sort(key=self.to_tuple)
         config["input_data"] = [(i, None) for i in self.inputfiles]
 
         if options.mask:
-            mask = urlparse(options.mask).path
+            mask = _url_path(options.mask)
             if os.path.isfile(mask):
                 logger.info("Reading Mask file from: %s", mask)
                 self.mask = os.path.abspath(mask)
@@ -327,11 +383,19 @@ If the number of files is too large, use double quotes like "*.edf" """
 
         if self.hdf5 is None:
             raise RuntimeError("No output HDF5 file provided")
+        if numpy.dtype(self.output_dtype).kind != "f":
+            # Unprocessed pixels are flagged with NaN
+            raise RuntimeError("The output dtype must be a floating point type, got %s" % self.output_dtype)
 
         logger.info("Initialization of HDF5 file")
         if os.path.exists(self.hdf5) and rewrite:
             os.unlink(self.hdf5)
 
+        # Drop the row pending for a former dataset, which may have another shape
+        self._row = None
+        self._row_buffer = None
+        self._row_error = None
+
         nxs = Nexus(self.hdf5, mode="w", creator="pyFAI")
         self.entry_grp = entry_grp = nxs.new_entry(entry="entry",
                                                    program_name="pyFAI",
@@ -374,7 +438,7 @@ If the number of files is too large, use double quotes like "*.edf" """
             self.dataset = self.nxdata_grp.create_dataset(
                             name="intensity",
                             shape=(self.npt_slow, self.npt_fast, self.npt_azim, self.npt_rad),
-                            dtype="float32",
+                            dtype=self.output_dtype,
                             chunks=(1, 1, self.npt_azim, self.npt_rad),
                             maxshape=(None, None, self.npt_azim, self.npt_rad),
                             fillvalue=numpy.NaN)
@@ -383,9 +447,15 @@ If the number of files is too large, use double quotes like "*.edf" """
             # Build a transposed view to display the mapping experiment
             layout = h5py.VirtualLayout(shape=(self.npt_azim, self.npt_rad, self.npt_slow, self.npt_fast), dtype=self.dataset.dtype)
             source = h5py.VirtualSource(self.dataset)
-            for i in range(self.npt_slow):
-                for j in range(self.npt_fast):
-                    layout[:, :, i, j] = source[i, j]
+            # One mapping per point of the pattern or per point of the map, whichever is fewer
+            if self.npt_azim * self.npt_rad < self.npt_slow * self.npt_fast:
+                for a in range(self.npt_azim):
+                    for r in range(self.npt_rad):
+                        layout[a, r] = source[:, :, a, r]
+            else:
+                for i in range(self.npt_slow):
+                    for j in range(self.npt_fast):
+                        layout[:, :, i, j] = source[i, j]
             self.nxdata_grp.create_virtual_dataset('map', layout, fillvalue=numpy.NaN).attrs["interpretation"] = "image"
 
         else:
@@ -393,7 +463,7 @@ If the number of files is too large, use double quotes like "*.edf" """
             self.dataset = self.nxdata_grp.create_dataset(
                             name="intensity",
                             shape=(self.npt_slow, self.npt_fast, self.npt_rad),
-                            dtype="float32",
+                            dtype=self.output_dtype,
                             chunks=(1, self.npt_fast, self.npt_rad),
                             maxshape=(None, None, self.npt_rad),
                             fillvalue=numpy.NaN)
@@ -402,9 +472,14 @@ If the number of files is too large, use double quotes like "*.edf" """
             # Build a transposed view to display the mapping experiment
             layout = h5py.VirtualLayout(shape=(self.npt_rad, self.npt_slow, self.npt_fast), dtype=self.dataset.dtype)
             source = h5py.VirtualSource(self.dataset)
-            for i in range(self.npt_slow):
-                for j in range(self.npt_fast):
-                    layout[:,i,j] = source[i,j]
+            # One mapping per point of the pattern or per point of the map, whichever is fewer
+            if self.npt_rad < self.npt_slow * self.npt_fast:
+                for r in range(self.npt_rad):
+                    layout[r] = source[:, :, r]
+            else:
+                for i in range(self.npt_slow):
+                    for j in range(self.npt_fast):
+                        layout[:, i, j] = source[i, j]
             self.nxdata_grp.create_virtual_dataset('map', layout, fillvalue=numpy.NaN).attrs["interpretation"] = "image"
 
 
@@ -466,7 +541,7 @@ If the number of files is too large, use double quotes like "*.edf" """
         if res.sigma is not None:
             self.dataset_error = self.nxdata_grp.create_dataset("errors",
                                                                 shape=self.dataset.shape,
-                                                                dtype="float32",
+                                                                dtype=self.dataset.dtype,
                                                                 chunks=(1,) + self.dataset.shape[1:],
                                                                 maxshape=(None,) + self.dataset.shape[1:])
             self.dataset_error.attrs["interpretation"] = "image" if self.dataset.ndim==4 else "spectrum"
@@ -514,15 +589,38 @@ If the number of files is too large, use double quotes like "*.edf" """
         :return: namedtuple: index, rot, trans
         """
         if idx is None:
-            n = self.inputfiles.index(filename) - self.offset
+            n = self._get_file_index(filename) - self.offset
         else:
             n = idx - self.offset
         return Position(n, n // self.npt_fast, n % self.npt_fast)
 
-    def process_one_file(self, filename):
+    def _get_file_index(self, filename):
+        """Index of a file in the list of input files
+
+        The index is looked up in a dictionary, which is rebuilt when the
+        list of input files has changed.
+
+        :param filename: name of the file
+        :return: index of the first occurrence of filename in inputfiles
+        """
+        index = self._file_index.get(filename)
+        if index is None or index >= len(self.inputfiles) or self.inputfiles[index] != filename:
+            self._file_index = {}
+            for i, name in enumerate(self.inputfiles):
+                self._file_index.setdefault(name, i)
+            index = self._file_index.get(filename)
+            if index is None:
+                raise ValueError(f"{filename} is not in the input files")
+        return index
+
+    def process_one_file(self, filename, fimg=None):
         """
+        Results are written one row at a time: call :meth:`flush` to write
+        the row in progress into the HDF5 file, :meth:`process` does it at
+        the end.
+
         :param filename: name of the input filename
-        :param idx: index of file
+        :param fimg: the file already opened with fabio, if any
         """
         if self.ai is None:
             self.setup_ai()
@@ -530,21 +628,23 @@ If the number of files is too large, use double quotes like "*.edf" """
             self.makeHDF5()
 
         t = time.perf_counter()
-        fimg = fabio.open(filename)
-        if "dataset" in dir(fimg):
-            if isinstance(fimg.dataset, list):
-                for ds in fimg.dataset:
-                    self.set_hdf5_input_dataset(ds)
-            else:
-                self.set_hdf5_input_dataset(fimg.dataset)
+        if fimg is None:
+            fimg = fabio.open(filename)
+        dataset = getattr(fimg, "dataset", None)
+        if isinstance(dataset, list):
+            for ds in dataset:
+                self.set_hdf5_input_dataset(ds)
+        elif dataset is not None:
+            self.set_hdf5_input_dataset(dataset)
+        nframes = fimg.nframes
         self.process_one_frame(fimg.data)
-        if fimg.nframes > 1:
-            for i in range(fimg.nframes - 1):
-                fimg = fimg.next()
-                self.process_one_frame(fimg.data)
+        if nframes > 1:
+            # Stream the other frames from the container rather than chaining next()
+            for frame in itertools.islice(fimg.frames(), 1, None):
+                self.process_one_frame(frame.data)
         t -= time.perf_counter()
         print("Processing %30s took %6.1fms (%i frames)" %
-              (os.path.basename(filename), -1000.0 * t, fimg.nframes))
+              (os.path.basename(filename), -1000.0 * t, nframes))
         self.timing.append(-t)
         self.processed_file.append(filename)
 
@@ -554,11 +654,12 @@ If the number of files is too large, use double quotes like "*.edf" """
             return
         if not (self.nxs and self.nxs.h5 and self.entry_grp):
             return
-        id_ = id(dataset)
-        if id_ in self.stored_input:
+        # id() may be reused once a dataset is garbage collected: use its location
+        key = (dataset.file.filename, dataset.name)
+        if key in self.stored_input:
             return
         else:
-            self.stored_input.add(id_)
+            self.stored_input.add(key)
         # Process 0: measurement group
         if "measurement" in self.entry_grp:
             measurement_grp = self.entry_grp["measurement"]
@@ -573,34 +674,73 @@ If the number of files is too large, use double quotes like "*.edf" """
 
     def process_one_frame(self, frame):
         """
+        Results are written one row at a time: call :meth:`flush` to write
+        the row in progress into the HDF5 file.
+
         :param frame: 2d numpy array with an image to process
         """
         self._idx += 1
-        pos = self.get_pos(None, self._idx)
+        # Same as get_pos, without building a Position for every frame
+        index = self._idx - self.offset
+        rot, trans = divmod(index, self.npt_fast)
         shape = self.dataset.shape
-        if pos.rot + 1 > shape[0]:
-            self.dataset.resize((pos.rot + 1,)+ shape[1:])
+        if rot + 1 > shape[0]:
+            self.dataset.resize((rot + 1,)+ shape[1:])
             if self.dataset_error is not None:
-                self.dataset_error.resize((pos.rot + 1,)+ shape[1:])
-        elif pos.index < 0 or pos.rot < 0 or pos.trans < 0:
+                self.dataset_error.resize((rot + 1,)+ shape[1:])
+        elif index < 0 or rot < 0 or trans < 0:
             return
 
         res = self.worker.process(frame)
-        self.dataset[pos.rot, pos.trans, ...] = res.intensity
+        if rot != self._row:
+            self.flush()
+            self._row = rot
+            self._row_start = trans
+        if self._row_buffer is None:
+            self._row_buffer = numpy.empty((self.npt_fast,) + shape[2:], dtype=self.dataset.dtype)
+        self._row_buffer[trans] = res.intensity
+        self._row_stop = trans + 1
         if res.sigma is not None:
-            self.dataset_error[pos.rot, pos.trans, ...] = res.sigma
+            if self._row_error is None:
+                self._row_error = numpy.empty_like(self._row_buffer)
+            self._row_error[trans] = res.sigma
+        if trans + 1 == self.npt_fast:
+            self.flush()
+
+    def flush(self):
+        """Write the pending row of results into the HDF5 datasets.
+
+        Results are written one row of the fast motor at a time, which
+        matches the chunking of the datasets.
+        """
+        if self._row is None:
+            return
+        row, start, stop = self._row, self._row_start, self._row_stop
+        _write_row(self.dataset, row, self._row_buffer, start, stop)
+        if self._row_error is not None and self.dataset_error is not None:
+            _write_row(self.dataset_error, row, self._row_error, start, stop)
+        self._row = None
 
     def process(self):
         if self.dataset is None:
             self.makeHDF5()
         self.init_ai()
         t0 = time.perf_counter()
-        for f in self.inputfiles:
-            self.process_one_file(f)
+        # The next file is read in the background while the current one is processed
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            nfiles = len(self.inputfiles)
+            if nfiles:
+                future = executor.submit(_open_image, self.inputfiles[0])
+            for i, f in enumerate(self.inputfiles):
+                fimg = future.result()
+                if i + 1 < nfiles:
+                    future = executor.submit(_open_image, self.inputfiles[i + 1])
+                self.process_one_file(f, fimg)
         tot = time.perf_counter() - t0
         cnt = max(self._idx, 0) + 1
         print(f"Execution time for {cnt} frames: {tot:.3f} s; "
               f"Average execution time: {1000. * tot / cnt:.1f} ms/img")
+        self.flush()
         self.nxs.close()
 
     def get_use_gpu(self):
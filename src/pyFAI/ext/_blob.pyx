@@ -38,24 +38,30 @@ It is used to find peaks in images by performing subsequent blurs.
 
 __authors__ = ["Aurore Deschildre", "Jérôme Kieffer"]
 __contact__ = "Jerome.kieffer@esrf.fr"
-__date__ = "26/12/2022"
+__date__ = "15/10/2026"
 __status__ = "stable"
 __license__ = "MIT"
 import cython
 import numpy
+from cython.parallel import prange
 from libc.stdint cimport int8_t
 
 
 def local_max(float[:, :, ::1] dogs, mask=None, bint n_5=False):
     """Calculate if a point is a maximum in a 3D space: (scale, y, x)
 
+    A point is a maximum when it is strictly larger than all its neighbors in
+    the 3x3 (or 5x5) patch of the current, previous and next DoG, and larger or
+    equal than the same pixel in the previous and next DoG. The comparisons
+    stop at the first failure, which rejects most pixels after a couple of reads.
+
     :param dogs: 3D array of difference of gaussian
     :param mask: mask with invalid pixels
     :param N_5: take a neighborhood of 5x5 pixel in plane
     :return: 3d_array with 1 where is_max
     """
     cdef bint do_mask = mask is not None
-    cdef int ns, ny, nx, s, x, y
+    cdef int ns, ny, nx, s, x, y, dx, dy, half
     cdef int8_t m
     cdef float c
     cdef int8_t[:, ::1] cmask
@@ -63,63 +69,31 @@ def local_max(float[:, :, ::1] dogs, mask=None, bint n_5=False):
     ns = dogs.shape[0]
     ny = dogs.shape[1]
     nx = dogs.shape[2]
+    half = 2 if n_5 else 1
     if do_mask:
         assert mask.shape[0] == ny, "mask shape 0/y"
         assert mask.shape[1] == nx, "mask shape 1/x"
         cmask = numpy.ascontiguousarray(mask, dtype=numpy.int8)
 
     is_max = numpy.zeros((ns, ny, nx), dtype=numpy.int8)
-    if (ns < 3) or (ny < 3) or (nx < 3):
-        return is_max
+    if (ns < 3) or (ny < 2 * half + 1) or (nx < 2 * half + 1):
+        return numpy.asarray(is_max)
     for s in range(1, ns - 1):
-        for y in range(1, ny - 1):
-            for x in range(1, nx - 1):
-                c = dogs[s, y, x]
+        for y in prange(half, ny - half, nogil=True):
+            for x in range(half, nx - half):
                 if do_mask and cmask[y, x]:
-                    m = 0
-                else:
-                    m = (c > dogs[s, y, x - 1]) and (c > dogs[s, y, x + 1]) and\
-                        (c > dogs[s, y - 1, x]) and (c > dogs[s, y + 1, x]) and\
-                        (c > dogs[s, y - 1, x - 1]) and (c > dogs[s, y - 1, x + 1]) and\
-                        (c > dogs[s, y + 1, x - 1]) and (c > dogs[s, y + 1, x + 1]) and\
-                        (c > dogs[s - 1, y, x]) and (c > dogs[s - 1, y, x]) and\
-                        (c > dogs[s - 1, y, x - 1]) and (c > dogs[s - 1, y, x + 1]) and\
-                        (c > dogs[s - 1, y - 1, x]) and (c > dogs[s - 1, y + 1, x]) and\
-                        (c > dogs[s - 1, y - 1, x - 1]) and (c > dogs[s - 1, y - 1, x + 1]) and\
-                        (c > dogs[s - 1, y + 1, x - 1]) and (c > dogs[s - 1, y + 1, x + 1]) and\
-                        (c > dogs[s + 1, y, x - 1]) and (c > dogs[s + 1, y, x + 1]) and\
-                        (c > dogs[s + 1, y - 1, x]) and (c > dogs[s + 1, y + 1, x]) and\
-                        (c > dogs[s + 1, y - 1, x - 1]) and (c > dogs[s + 1, y - 1, x + 1]) and\
-                        (c > dogs[s + 1, y + 1, x - 1]) and (c > dogs[s + 1, y + 1, x + 1])
-                    if not m:
-                        continue
-                    if n_5:
-                        if x > 1:
-                            m = (m and (c > dogs[s, y, x - 2]) and (c > dogs[s, y - 1, x - 2]) and (c > dogs[s, y + 1, x - 2]) and
-                                 (c > dogs[s - 1, y, x - 2]) and (c > dogs[s - 1, y - 1, x - 2]) and (c > dogs[s - 1, y + 1, x - 2]) and
-                                 (c > dogs[s + 1, y, x - 2]) and (c > dogs[s + 1, y - 1, x - 2]) and (c > dogs[s + 1, y + 1, x - 2]))
-                            if y > 1:
-                                m = m and (c > dogs[s, y - 2, x - 2])and (c > dogs[s - 1, y - 2, x - 2]) and (c > dogs[s, y - 2, x - 2])
-                            if y < ny - 2:
-                                m = m and (c > dogs[s, y + 2, x - 2])and (c > dogs[s - 1, y + 2, x - 2]) and (c > dogs[s, y + 2, x - 2])
-                        if x < (nx - 2):
-                            m = (m and (c > dogs[s, y, x + 2]) and (c > dogs[s, y - 1, x + 2]) and (c > dogs[s, y + 1, x + 2]) and
-                                 (c > dogs[s - 1, y, x + 2]) and (c > dogs[s - 1, y - 1, x + 2]) and (c > dogs[s - 1, y + 1, x + 2]) and
-                                 (c > dogs[s + 1, y, x + 2]) and (c > dogs[s + 1, y - 1, x + 2]) and (c > dogs[s + 1, y + 1, x + 2]))
-                            if y > 1:
-                                m = m and (c > dogs[s, y - 2, x + 2])and (c > dogs[s - 1, y - 2, x + 2]) and (c > dogs[s, y - 2, x + 2])
-                            if y < ny - 2:
-                                m = m and (c > dogs[s, y + 2, x + 2])and (c > dogs[s - 1, y + 2, x + 2]) and (c > dogs[s, y + 2, x + 2])
-
-                        if y > 1:
-                            m = (m and (c > dogs[s, y - 2, x]) and (c > dogs[s, y - 2, x - 1]) and (c > dogs[s, y - 2, x + 1]) and
-                                 (c > dogs[s - 1, y - 2, x]) and (c > dogs[s - 1, y - 2, x - 1]) and (c > dogs[s - 1, y - 2, x + 1]) and
-                                 (c > dogs[s + 1, y - 2, x]) and (c > dogs[s + 1, y - 2, x - 1]) and (c > dogs[s + 1, y + 2, x + 1]))
-
-                        if y < (ny - 2):
-                            m = (m and (c > dogs[s, y + 2, x]) and (c > dogs[s, y + 2, x - 1]) and (c > dogs[s, y + 2, x + 1]) and
-                                 (c > dogs[s - 1, y + 2, x]) and (c > dogs[s - 1, y + 2, x - 1]) and (c > dogs[s - 1, y + 2, x + 1]) and
-                                 (c > dogs[s + 1, y + 2, x]) and (c > dogs[s + 1, y + 2, x - 1]) and (c > dogs[s + 1, y + 2, x + 1]))
-
+                    continue
+                c = dogs[s, y, x]
+                m = (c >= dogs[s - 1, y, x]) and (c >= dogs[s + 1, y, x])
+                dy = -half
+                while m and (dy <= half):
+                    dx = -half
+                    while m and (dx <= half):
+                        if dy or dx:
+                            m = (c > dogs[s, y + dy, x + dx]) and\
+                                (c > dogs[s - 1, y + dy, x + dx]) and\
+                                (c > dogs[s + 1, y + dy, x + dx])
+                        dx = dx + 1
+                    dy = dy + 1
                 is_max[s, y, x] = m
     return numpy.asarray(is_max)
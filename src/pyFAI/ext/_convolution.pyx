@@ -38,7 +38,7 @@ algorithm.
 
 __authors__ = ["Pierre Paleo", "Jérôme Kieffer"]
 __contact__ = "Jerome.kieffer@esrf.fr"
-__date__ = "03/03/2023"
+__date__ = "15/10/2026"
 __status__ = "stable"
 __license__ = "MIT"
 
@@ -48,7 +48,8 @@ from cython.parallel import prange
 
 
 def horizontal_convolution(float[:, ::1] img,
-                           float[::1] filter):
+                           float[::1] filter,
+                           float[:, ::1] output=None):
     """
     Implements a 1D horizontal convolution with a filter.
     The only implemented mode is "reflect" (default in scipy.ndimage.filter)
@@ -57,6 +58,7 @@ def horizontal_convolution(float[:, ::1] img,
 
     :param img: input image
     :param filter: 1D array with the coefficients of the array
+    :param output: array of the same shape as image to store the result (optional)
     :return: array of the same shape as image with
     """
     cdef:
@@ -64,7 +66,6 @@ def horizontal_convolution(float[:, ::1] img,
         int IMAGE_H, IMAGE_W
         int x, y, fIndex, newpos
         double acc
-        float[:, ::1] output
 
     FILTER_SIZE = filter.shape[0]
     if FILTER_SIZE % 2 == 1:
@@ -74,7 +75,11 @@ def horizontal_convolution(float[:, ::1] img,
 
     IMAGE_H = img.shape[0]
     IMAGE_W = img.shape[1]
-    output = numpy.zeros((IMAGE_H, IMAGE_W), dtype=numpy.float32)
+    if output is None:
+        output = numpy.empty((IMAGE_H, IMAGE_W), dtype=numpy.float32)
+    else:
+        assert output.shape[0] == IMAGE_H, "output shape 0/y"
+        assert output.shape[1] == IMAGE_W, "output shape 1/x"
     for y in prange(IMAGE_H, nogil=True):
         for x in range(IMAGE_W):
             acc = 0.0
@@ -84,12 +89,14 @@ def horizontal_convolution(float[:, ::1] img,
                     newpos = - newpos - 1
                 elif newpos >= IMAGE_W:
                     newpos = 2 * IMAGE_W - newpos - 1
-                acc += img[y, newpos] * filter[fIndex]
-            output[y, x] += <float> acc
+                acc = acc + img[y, newpos] * filter[fIndex]
+            output[y, x] = <float> acc
     return numpy.asarray(output)
 
 
-def vertical_convolution(float[:, ::1] img, float[::1] filter):
+def vertical_convolution(float[:, ::1] img,
+                         float[::1] filter,
+                         float[:, ::1] output=None):
     """
     Implements a 1D vertical convolution with a filter.
     The only implemented mode is "reflect" (default in scipy.ndimage.filter)
@@ -98,6 +105,7 @@ def vertical_convolution(float[:, ::1] img, float[::1] filter):
 
     :param img: input image
     :param filter: 1D array with the coefficients of the array
+    :param output: array of the same shape as image to store the result (optional)
     :return: array of the same shape as image with
     """
     cdef:
@@ -105,7 +113,6 @@ def vertical_convolution(float[:, ::1] img, float[::1] filter):
         int IMAGE_H, IMAGE_W
         int x, y, fIndex, newpos
         double acc
-        float[:, ::1] output
 
     FILTER_SIZE = filter.shape[0]
     if FILTER_SIZE % 2 == 1:
@@ -115,7 +122,11 @@ def vertical_convolution(float[:, ::1] img, float[::1] filter):
 
     IMAGE_H = img.shape[0]
     IMAGE_W = img.shape[1]
-    output = numpy.zeros((IMAGE_H, IMAGE_W), dtype=numpy.float32)
+    if output is None:
+        output = numpy.empty((IMAGE_H, IMAGE_W), dtype=numpy.float32)
+    else:
+        assert output.shape[0] == IMAGE_H, "output shape 0/y"
+        assert output.shape[1] == IMAGE_W, "output shape 1/x"
     for y in prange(IMAGE_H, nogil=True):
         for x in range(IMAGE_W):
             acc = 0.0
@@ -125,8 +136,8 @@ def vertical_convolution(float[:, ::1] img, float[::1] filter):
                     newpos = - newpos - 1
                 elif newpos >= IMAGE_H:
                     newpos = 2 * IMAGE_H - newpos - 1
-                acc += img[newpos, x] * filter[fIndex]
-            output[y, x] += <float> acc
+                acc = acc + img[newpos, x] * filter[fIndex]
+            output[y, x] = <float> acc
     return numpy.asarray(output)
 
 
@@ -153,14 +164,16 @@ def gaussian(sigma, width=None):
     return g / g.sum()
 
 
-def gaussian_filter(img, sigma):
+def gaussian_filter(img, sigma, output=None, tmp=None):
     """
     Performs a gaussian bluring using a gaussian kernel.
 
     :param img: input image
     :param sigma: width parameter of the gaussian
+    :param output: float32 array of the same shape as image to store the result (optional)
+    :param tmp: float32 array of the same shape as image to store the horizontal pass (optional)
     """
     raw = numpy.ascontiguousarray(img, dtype=numpy.float32)
     gauss = gaussian(sigma).astype(numpy.float32)
-    res = vertical_convolution(horizontal_convolution(raw, gauss), gauss)
-    return res
+    res = vertical_convolution(horizontal_convolution(raw, gauss, tmp), gauss, output)
+    return numpy.asarray(res)
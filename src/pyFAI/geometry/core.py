@@ -40,7 +40,7 @@ __author__ = "Jerome Kieffer"
 __contact__ = "Jerome.Kieffer@ESRF.eu"
 __license__ = "MIT"
 __copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
-__date__ = "13/12/2023"
+__date__ = "15/10/2026"
 __status__ = "production"
 __docformat__ = 'restructuredtext'
 
@@ -2231,11 +2231,18 @@ class Geometry(object):
         return shape
 
     def set_dist(self, value):
+        """Set the sample-detector distance, in meter.
+
+        Cached arrays are only reset when the value changes: setting the
+        same value again keeps them, use :meth:`reset` to drop them.
+        """
+        old = self._dist
         if isinstance(value, float):
             self._dist = value
         else:
             self._dist = float(value)
-        self.reset()
+        if self._dist != old:
+            self.reset()
 
     def get_dist(self):
         return self._dist
@@ -2243,13 +2250,20 @@ class Geometry(object):
     dist = property(get_dist, set_dist)
 
     def set_poni1(self, value):
+        """Set the coordinate of the PONI along the slow axis, in meter.
+
+        Cached arrays are only reset when the value changes: setting the
+        same value again keeps them, use :meth:`reset` to drop them.
+        """
+        old = self._poni1
         if isinstance(value, float):
             self._poni1 = value
         elif isinstance(value, (tuple, list)):
             self._poni1 = float(value[0])
         else:
             self._poni1 = float(value)
-        self.reset()
+        if self._poni1 != old:
+            self.reset()
 
     def get_poni1(self):
         return self._poni1
@@ -2257,13 +2271,20 @@ class Geometry(object):
     poni1 = property(get_poni1, set_poni1)
 
     def set_poni2(self, value):
+        """Set the coordinate of the PONI along the fast axis, in meter.
+
+        Cached arrays are only reset when the value changes: setting the
+        same value again keeps them, use :meth:`reset` to drop them.
+        """
+        old = self._poni2
         if isinstance(value, float):
             self._poni2 = value
         elif isinstance(value, (tuple, list)):
             self._poni2 = float(value[0])
         else:
             self._poni2 = float(value)
-        self.reset()
+        if self._poni2 != old:
+            self.reset()
 
     def get_poni2(self):
         return self._poni2
@@ -2271,13 +2292,20 @@ class Geometry(object):
     poni2 = property(get_poni2, set_poni2)
 
     def set_rot1(self, value):
+        """Set the first rotation, around the vertical axis, in radians.
+
+        Cached arrays are only reset when the value changes: setting the
+        same value again keeps them, use :meth:`reset` to drop them.
+        """
+        old = self._rot1
         if isinstance(value, float):
             self._rot1 = value
         elif isinstance(value, (tuple, list)):
             self._rot1 = float(value[0])
         else:
             self._rot1 = float(value)
-        self.reset()
+        if self._rot1 != old:
+            self.reset()
 
     def get_rot1(self):
         return self._rot1
@@ -2285,13 +2313,20 @@ class Geometry(object):
     rot1 = property(get_rot1, set_rot1)
 
     def set_rot2(self, value):
+        """Set the second rotation, around the horizontal axis, in radians.
+
+        Cached arrays are only reset when the value changes: setting the
+        same value again keeps them, use :meth:`reset` to drop them.
+        """
+        old = self._rot2
         if isinstance(value, float):
             self._rot2 = value
         elif isinstance(value, (tuple, list)):
             self._rot2 = float(value[0])
         else:
             self._rot2 = float(value)
-        self.reset()
+        if self._rot2 != old:
+            self.reset()
 
     def get_rot2(self):
         return self._rot2
@@ -2299,13 +2334,20 @@ class Geometry(object):
     rot2 = property(get_rot2, set_rot2)
 
     def set_rot3(self, value):
+        """Set the third rotation, around the beam, in radians.
+
+        Cached arrays are only reset when the value changes: setting the
+        same value again keeps them, use :meth:`reset` to drop them.
+        """
+        old = self._rot3
         if isinstance(value, float):
             self._rot3 = value
         elif isinstance(value, (tuple, list)):
             self._rot3 = float(value[0])
         else:
             self._rot3 = float(value)
-        self.reset()
+        if self._rot3 != old:
+            self.reset()
 
     def get_rot3(self):
         return self._rot3
@@ -25,7 +25,7 @@
 
 __authors__ = ["V. Valls"]
 __license__ = "MIT"
-__date__ = "17/12/2021"
+__date__ = "15/10/2026"
 
 import numpy
 import time
@@ -52,6 +52,7 @@ class CreateSceneThread(qt.QThread):
         self.__mask = None
         self.__colormap = None
         self.__geometry = None
+        self.__indexesCache = {}
         self.__last = None
 
     def setDetector(self, detector):
@@ -69,6 +70,17 @@ class CreateSceneThread(qt.QThread):
     def setGeometry(self, geometry):
         self.__geometry = geometry
 
+    def setIndexesCache(self, cache):
+        """Set a dictionary used to share the triangle indexes between
+        successive scenes.
+
+        Indexes only depend on the number of pixels, and are never modified
+        once created.
+
+        :param dict cache: Number of pixels -> triangle indexes
+        """
+        self.__indexesCache = cache
+
     def emitProgressValue(self, value, force=False):
         now = time.perf_counter()
         if not force and self.__last is not None and now - self.__last < 1.0:
@@ -110,37 +122,42 @@ class CreateSceneThread(qt.QThread):
         if self.__geometry is not None:
             if self.__detector is not None:
                 self.__geometry.detector = self.__detector
-            pixels = self.__geometry.calc_pos_zyx(corners=True)
-            pixels = numpy.array(pixels)
-            pixels = numpy.moveaxis(pixels, 0, -1)
+            zyx = self.__geometry.calc_pos_zyx(corners=True)
+            # Fill the (..., 3) array directly, instead of stacking then
+            # moving the axis, which requires a second contiguous copy
+            pixels = numpy.empty(zyx[0].shape + (3,), dtype=numpy.float32)
+            for i, component in enumerate(zyx):
+                pixels[..., i] = component
         else:
             pixels = self.__detector.get_pixel_corners()
+        # Progress is reported per stage, the mesh is built with whole-array operations
+        self.emitProgressValue(50, force=True)
 
-        # Merge all pixels together
-        pixels = pixels[...]
-        vertices = numpy.reshape(pixels, (-1, 3))
+        # Merge all pixels together, OpenGL works in float32 anyway
+        vertices = numpy.ascontiguousarray(pixels, dtype=numpy.float32).reshape(-1, 3)
 
         if self.__image is not None:
-            pixelValues = self.__image
-            pixelValues = pixelValues.reshape(-1)
+            # Always a single contiguous copy, whatever the layout of the
+            # image: masked pixels are set to NaN below
+            pixelValues = numpy.array(self.__image, dtype=numpy.float32).reshape(-1)
         else:
-            pixelValues = numpy.zeros(vertices.shape[0] // 4)
+            pixelValues = numpy.zeros(vertices.shape[0] // 4, dtype=numpy.float32)
 
         if self.__mask is not None:
             mask = self.__mask.reshape(-1)
-            if pixelValues.dtype.kind in "ui":
-                pixelValues = pixelValues.astype(float)
             pixelValues[mask != 0] = float("nan")
 
-        values = numpy.empty(shape=(vertices.shape[0]))
-        values[0::4] = pixelValues
-        values[1::4] = pixelValues
-        values[2::4] = pixelValues
-        values[3::4] = pixelValues
+        # The 4 corners of a pixel share its value
+        values = numpy.repeat(pixelValues, 4)
 
-        plus = numpy.array([0, 1, 2, 2, 3, 0], dtype=numpy.uint32)
-        indexes = (numpy.atleast_2d(4 * numpy.arange(vertices.shape[0] // 4, dtype=numpy.uint32)).T + plus).ravel()
-        indexes = indexes.astype(numpy.uint32)
+        # 2 triangles per pixel: corners (0, 1, 2) and (2, 3, 0)
+        indexes = self.__indexesCache.get(vertices.shape[0])
+        if indexes is None:
+            plus = numpy.array([0, 1, 2, 2, 3, 0], dtype=numpy.uint32)
+            first = numpy.arange(0, vertices.shape[0], 4, dtype=numpy.uint32)
+            indexes = (first[:, None] + plus).ravel()
+            indexes.flags.writeable = False
+            self.__indexesCache[vertices.shape[0]] = indexes
 
         colormap = self.__colormap
         if colormap is None:
@@ -155,6 +172,7 @@ class CreateSceneThread(qt.QThread):
                      copy=False)
         item.setColormap(colormap)
         self.__detectorItem = item
+        self.emitProgressValue(100, force=True)
         return True
 
     def hasGeometry(self):
@@ -228,6 +246,9 @@ class Detector3dDialog(qt.QDialog):
         layout.addWidget(self.__process)
         layout.addWidget(self.__buttons)
 
+        # Triangle indexes shared by the scenes built for this dialog
+        self.__indexesCache = {}
+
     def __detectorLoaded(self, thread):
         if thread.isAborted():
             template = "<html>3D preview cancelled:<br/>%s</html>"
@@ -263,6 +284,7 @@ class Detector3dDialog(qt.QDialog):
         thread.setImage(image)
         thread.setMask(mask)
         thread.setColormap(colormap)
+        thread.setIndexesCache(self.__indexesCache)
 
         thread.finished.connect(functools.partial(self.__detectorLoaded, thread))
         thread.finished.connect(thread.deleteLater)
@@ -31,7 +31,7 @@ __author__ = "Jérôme Kieffer"
 __contact__ = "Jerome.Kieffer@ESRF.eu"
 __license__ = "MIT"
 __copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
-__date__ = "29/03/2023"
+__date__ = "15/10/2026"
 __status__ = "development"
 __docformat__ = 'restructuredtext'
 
@@ -147,6 +147,7 @@ class DiffMapWidget(qt.QWidget):
 #     progressbarAborted = Signal()
     uif = "diffmap.ui"
     json_file = ".diffmap.json"
+    flush_period = 1.0  # seconds between two writes of an incomplete row for the online display
 
     def __init__(self):
         qt.QWidget.__init__(self)
@@ -191,6 +192,7 @@ class DiffMapWidget(qt.QWidget):
         self.azimuthal_data = None
         self.data_h5 = None  # one in hdf5 dataset while processing.
         self.data_np = None  # The numpy one is used only at the end.
+        self._map_buffer = None  # re-used when reading data_h5 while processing
         self.last_idx = -1
         self.slice = slice(0, -1, 1)  # Default slicing
         self._menu_file()
@@ -466,17 +468,25 @@ class DiffMapWidget(qt.QWidget):
             diffmap.hdf5 = config.get("output_file", "unamed.h5")
             self.radial_data, self.azimuthal_data = diffmap.init_ai()
             self.data_h5 = diffmap.dataset
+            last_flush = time.perf_counter()
             for i, fn in enumerate(self.list_dataset):
                 diffmap.process_one_file(fn.path)
+                now = time.perf_counter()
+                if now - last_flush > self.flush_period:
+                    # Write the row in progress from time to time, so that the online map shows it
+                    diffmap.flush()
+                    last_flush = now
                 self.progressbarChanged.emit(i, diffmap._idx)
                 if self.aborted:
                     logger.warning("Aborted by user")
                     self.progressbarChanged.emit(0, 0)
                     if diffmap.nxs:
+                        diffmap.flush()
                         self.data_np = diffmap.dataset[()]
                         diffmap.nxs.close()
                     return
             if diffmap.nxs:
+                diffmap.flush()
                 self.data_np = diffmap.dataset[()]
                 diffmap.nxs.close()
         logger.warning("Processing finished in %.3fs", time.perf_counter() - t0)
@@ -521,12 +531,13 @@ class DiffMapWidget(qt.QWidget):
             return
 
         with self.update_sem:
+            if self.radial_data is None:
+                # Nothing to plot against: do not read the dataset at all
+                return
             try:
-                data = self.data_h5[()]
+                data = self._read_map()
             except ValueError:
                 data = self.data_np
-            if self.radial_data is None:
-                return
 
             npt = self.radial_data.size
             intensity = numpy.nanmean(data, axis=(0,1))
@@ -565,13 +576,27 @@ class DiffMapWidget(qt.QWidget):
                 self.img.set_data(img)
             self.last_idx = idx_img
             try:
-                self.fig.canvas.draw()
+                self.fig.canvas.draw_idle()
             except Exception as err:
                 logger.error(f"{type(err)}: {err} intercepted in matplotlib drawing")
 
             qt.QCoreApplication.processEvents()
             time.sleep(0.1)
 
+    def _read_map(self):
+        """Read the map being processed into a buffer kept between refreshes
+
+        :return: numpy array with the content of data_h5 (or data_np once closed)
+        """
+        dataset = self.data_h5
+        if not dataset:
+            return self.data_np
+        buffer = self._map_buffer
+        if (buffer is None) or (buffer.shape != dataset.shape) or (buffer.dtype != dataset.dtype):
+            buffer = self._map_buffer = numpy.empty(dataset.shape, dtype=dataset.dtype)
+        dataset.read_direct(buffer)
+        return buffer
+
     def update_slice(self, *args):
         """
         Update the slice
@@ -42,7 +42,7 @@ __author__ = "Jerome Kieffer"
 __contact__ = "Jerome.Kieffer@ESRF.eu"
 __license__ = "MIT"
 __copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
-__date__ = "25/09/2023"
+__date__ = "15/10/2026"
 __status__ = "production"
 __docformat__ = 'restructuredtext'
 
@@ -171,7 +171,11 @@ class HDF5Writer(Writer):
     MODE_APPEND = "append"
     MODE_OVERWRITE = "overwrite"
 
-    def __init__(self, filename, hpath=None, entry_template=None, fast_scan_width=None, append_frames=False, mode=MODE_ERROR):
+    MAXIMUM_WRITE_BUFFER_SIZE = 64 * 1024 * 1024
+    "Size in bytes of consecutive frames kept in memory before being written at once"
+
+    def __init__(self, filename, hpath=None, entry_template=None, fast_scan_width=None, append_frames=False, mode=MODE_ERROR,
+                 compression=None):
         """
         Constructor of an HDF5 writer:
 
@@ -179,6 +183,8 @@ class HDF5Writer(Writer):
         :param str hpath: Name of the entry group that will contains the NXprocess.
         :param str entry_template: Formattable template to create a new entry (if hpath is not specified)
         :param int fast_scan_width: set it to define the width of
+        :param dict compression: HDF5 filter options for the result datasets, like an `hdf5plugin` filter.
+                                 By default, results are not compressed.
         """
         Writer.__init__(self, filename)
         if entry_template is None:
@@ -214,6 +220,9 @@ class HDF5Writer(Writer):
         self._current_frame = None
         self._append_frames = append_frames
         self._mode = mode
+        self._compression = compression
+        self._buffer = []  # list of (intensity, error) for consecutive frames
+        self._buffer_start = 0
 
     def __repr__(self):
         return "HDF5 writer on file {self.filename}:{self.hpath} {'' if self._initialized else 'un'}initialized {}"
@@ -387,6 +396,7 @@ class HDF5Writer(Writer):
         with self._sem:
             if not (self.nxs and self.nxs.h5):
                 raise RuntimeError('No opened file')
+            self._flush_buffer()
             if radial is not None:
                 if radial.shape == self.radial_ds.shape:
                     self.radial_ds[:] = radial
@@ -473,13 +483,14 @@ class HDF5Writer(Writer):
                 if error is not None:
                     self.error_ds [index0, index1] = error
             else:
-                if index >= self.intensity_ds.shape[0]:
-                    self.intensity_ds.resize(index + 1, axis=0)
-                    if error is not None:
-                        self.error_ds.resize(index + 1, axis=0)
-                self.intensity_ds[index] = intensity
-                if error is not None:
-                    self.error_ds [index] = error
+                # Consecutive frames are buffered and written together
+                if self._buffer and index != self._buffer_start + len(self._buffer):
+                    self._flush_buffer()
+                if not self._buffer:
+                    self._buffer_start = index
+                self._buffer.append((numpy.array(intensity), None if error is None else numpy.array(error)))
+                if len(self._buffer) * self._buffer[0][0].nbytes >= self.MAXIMUM_WRITE_BUFFER_SIZE:
+                    self._flush_buffer()
 
             if (not self.has_azimuthal_values) and \
                (azimuthal is not None) and \
@@ -496,6 +507,30 @@ class HDF5Writer(Writer):
                 self.radial_ds[:] = radial
                 self.has_radial_values = True
 
+    def _flush_buffer(self):
+        """Write the buffered frames with a single operation per dataset.
+
+        The semaphore is expected to be held by the caller.
+        """
+        if not self._buffer:
+            return
+        start = self._buffer_start
+        end = start + len(self._buffer)
+        intensities, errors = zip(*self._buffer)
+        self._buffer = []
+        if end > self.intensity_ds.shape[0]:
+            self.intensity_ds.resize(end, axis=0)
+        self.intensity_ds[start:end] = numpy.stack(intensities)
+        if self.error_ds is not None:
+            if end > self.error_ds.shape[0]:
+                self.error_ds.resize(end, axis=0)
+            if all(error is not None for error in errors):
+                self.error_ds[start:end] = numpy.stack(errors)
+            else:
+                for index, error in enumerate(errors, start):
+                    if error is not None:
+                        self.error_ds[index] = error
+
     def _require_dataset(self, name, dtype):
         """Returns the dataset to store data/error ."""
 
@@ -505,14 +540,15 @@ class HDF5Writer(Writer):
                                                      dtype=dtype,
                                                      chunks=self.chunk,
                                                      maxshape=(None,) + self.chunk[1:],
-                                                     **CMP)
+                                                     **(CMP if self._compression is None else self._compression))
             result.attrs["interpretation"] = u"image"
         else:
             result = self.nxdata_grp.require_dataset(name,
                                                      shape=self.shape,
                                                      dtype=dtype,
                                                      chunks=self.chunk,
-                                                     maxshape=(None,) + self.chunk[1:])
+                                                     maxshape=(None,) + self.chunk[1:],
+                                                     **(self._compression or {}))
 
             result.attrs["interpretation"] = u"spectrum"
         return result
@@ -36,12 +36,13 @@ __author__ = "Jerome Kieffer"
 __contact__ = "Jerome.Kieffer@ESRF.eu"
 __license__ = "MIT"
 __copyright__ = "2012-2017 European Synchrotron Radiation Facility, Grenoble, France"
-__date__ = "03/10/2023"
+__date__ = "15/10/2026"
 __status__ = "stable"
 
 import os
 import logging
 import platform
+import functools
 import numpy
 from ..utils.decorators import deprecated
 logger = logging.getLogger(__name__)
@@ -85,3 +86,42 @@ def dtype_converter(dtype):
         return numpy.int8(dtype.itemsize)
     else:
         return numpy.int8(8*dtype.itemsize)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_kernel_source(kernel_files):
+    """Read and concatenate the source of the kernels, only once per set of files
+
+    :param kernel_files: tuple of kernel files
+    :return: source code as a string
+    """
+    return concatenate_cl_kernel(kernel_files)
+
+
+def get_program(ctx, kernel_files, compile_options=""):
+    """Build an OpenCL program, or retrieve it if it was already built in this context
+
+    Programs are shared between processing instances, each of them creating
+    its own kernels from it. The cache is stored on the context, so that
+    programs are released together with their context.
+
+    :param ctx: OpenCL context
+    :param kernel_files: list of kernel files, as in `OpenclProcessing.kernel_files`
+    :param compile_options: string with the compilation options
+    :return: built pyopencl.Program
+    """
+    programs = getattr(ctx, "_pyfai_programs", None)
+    if programs is None:
+        # key: (kernel files, compile options)
+        programs = ctx._pyfai_programs = {}
+    key = (tuple(kernel_files), compile_options)
+    program = programs.get(key)
+    if program is None:
+        kernel_src = _get_kernel_source(tuple(kernel_files))
+        logger.info("Compiling file %s with options %s", kernel_files, compile_options)
+        try:
+            program = pyopencl.Program(ctx, kernel_src).build(options=compile_options)
+        except (pyopencl.MemoryError, pyopencl.LogicError) as error:
+            raise MemoryError(error)
+        programs[key] = program
+    return program
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+#
+#    Project: Azimuthal integration
+#             https://github.com/silx-kit/pyFAI
+#
+#    Copyright (C) 2026-2026 European Synchrotron Radiation Facility, Grenoble, France
+#
+#    Principal author:       Jérôme Kieffer (Jerome.Kieffer@ESRF.eu)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+OpenCL implementation of the local maximum search used in blob detection
+"""
+
+__author__ = "Jérôme Kieffer"
+__license__ = "MIT"
+__date__ = "15/10/2026"
+__copyright__ = "2026, ESRF, Grenoble"
+__contact__ = "jerome.kieffer@esrf.fr"
+
+import logging
+logger = logging.getLogger(__name__)
+
+from collections import OrderedDict
+import numpy
+from . import pyopencl
+if pyopencl is None:
+    raise ImportError("pyopencl is not installed")
+from . import mf, processing, OpenclProcessing, get_program
+EventDescription = processing.EventDescription
+BufferDescription = processing.BufferDescription
+KernelContainer = processing.KernelContainer
+
+
+class OCL_LocalMax(OpenclProcessing):
+    """OpenCL class searching for local maxima in a stack of difference of gaussians"""
+    kernel_files = ["pyfai:openCL/blob.cl"]
+
+    def __init__(self, shape, ctx=None, devicetype="all", platformid=None, deviceid=None,
+                 block_size=None, profile=False):
+        """
+        :param shape: shape of the stack of DoG: (scale, y, x)
+        :param ctx: actual working context, left to None for automatic
+                    initialization from device type or platformid/deviceid
+        :param devicetype: type of device, can be "CPU", "GPU", "ACC" or "ALL"
+        :param platformid: integer with the platform_identifier, as given by clinfo
+        :param deviceid: Integer with the device identifier, as given by clinfo
+        :param block_size: preferred workgroup size, may vary depending on the outpcome of the compilation
+        :param profile: switch on profiling to be able to profile at the kernel level,
+                        store profiling elements (makes code slower)
+        """
+        OpenclProcessing.__init__(self, ctx=ctx, devicetype=devicetype,
+                                  platformid=platformid, deviceid=deviceid,
+                                  block_size=block_size, profile=profile)
+        self.shape = tuple(int(i) for i in shape)
+        assert len(self.shape) == 3, "shape is 3D: (scale, y, x)"
+        size = self.shape[0] * self.shape[1] * self.shape[2]
+        frame = self.shape[1] * self.shape[2]
+        self.buffers = [BufferDescription("dogs", size, numpy.float32, mf.READ_ONLY),
+                        BufferDescription("mask", frame, numpy.int8, mf.READ_ONLY),
+                        BufferDescription("is_max", size, numpy.int8, mf.WRITE_ONLY)]
+        self.allocate_buffers()
+        self.compile_kernels()
+        self.set_kernel_arguments()
+
+    def compile_kernels(self, kernel_files=None, compile_options=None):
+        """Call the OpenCL compiler, unless the program was already built in this context
+
+        :param kernel_files: list of path to the kernel
+            (by default use the one declared in the class)
+        :param compile_options: string of compile options
+        """
+        kernel_files = kernel_files or self.kernel_files
+        compile_options = compile_options or self.get_compiler_options()
+        self.program = get_program(self.ctx, kernel_files, compile_options)
+        self.kernels = KernelContainer(self.program)
+
+    def set_kernel_arguments(self):
+        """Tie arguments of OpenCL kernel-functions to the actual kernels
+        """
+        depth, height, width = self.shape
+        self.cl_kernel_args["local_max"] = OrderedDict((("dogs", self.cl_mem["dogs"]),
+                                                        ("mask", self.cl_mem["mask"]),
+                                                        ("do_mask", numpy.int8(0)),
+                                                        ("is_max", self.cl_mem["is_max"]),
+                                                        ("depth", numpy.int32(depth)),
+                                                        ("height", numpy.int32(height)),
+                                                        ("width", numpy.int32(width)),
+                                                        ("half_size", numpy.int32(1))))
+
+    def local_max(self, dogs, mask=None, n_5=False):
+        """Calculate if a point is a maximum in a 3D space: (scale, y, x)
+
+        :param dogs: 3D array of difference of gaussian
+        :param mask: mask with invalid pixels
+        :param n_5: take a neighborhood of 5x5 pixel in plane
+        :return: 3d_array with 1 where is_max
+        """
+        assert dogs.shape == self.shape, "dogs have the expected shape"
+        events = []
+        with self.sem:
+            kwargs = self.cl_kernel_args["local_max"]
+            evt = pyopencl.enqueue_copy(self.queue, self.cl_mem["dogs"],
+                                        numpy.ascontiguousarray(dogs, dtype=numpy.float32))
+            events.append(EventDescription("copy H->D dogs", evt))
+            if mask is None:
+                kwargs["do_mask"] = numpy.int8(0)
+            else:
+                assert mask.shape == self.shape[1:], "mask has the shape of one DoG"
+                # The mask is small and may have been modified in place: always upload it
+                evt = pyopencl.enqueue_copy(self.queue, self.cl_mem["mask"],
+                                            numpy.ascontiguousarray(mask, dtype=numpy.int8))
+                events.append(EventDescription("copy H->D mask", evt))
+                kwargs["do_mask"] = numpy.int8(1)
+            kwargs["half_size"] = numpy.int32(2 if n_5 else 1)
+
+            wg = (min(self.block_size or 32, 32), 1, 1)
+            size = tuple((s + w - 1) // w * w for s, w in zip(self.shape[-1::-1], wg))
+            evt = self.kernels.local_max(self.queue, size, wg, *kwargs.values())
+            events.append(EventDescription("local_max", evt))
+
+            is_max = numpy.empty(self.shape, dtype=numpy.int8)
+            evt = pyopencl.enqueue_copy(self.queue, is_max, self.cl_mem["is_max"])
+            evt.wait()
+            events.append(EventDescription("copy D->H is_max", evt))
+        self.profile_multi(events)
+        return is_max
@@ -33,7 +33,7 @@ separation on GPU.
 
 __author__ = "Jérôme Kieffer"
 __license__ = "MIT"
-__date__ = "06/10/2022"
+__date__ = "15/10/2026"
 __copyright__ = "2015, ESRF, Grenoble"
 __contact__ = "jerome.kieffer@esrf.fr"
 
@@ -48,9 +48,10 @@ if ocl:
     from . import processing, OpenclProcessing
     EventDescription = processing.EventDescription
     BufferDescription = processing.BufferDescription
+    KernelContainer = processing.KernelContainer
 else:
     raise ImportError("pyopencl is not installed or no device is available")
-from. import release_cl_buffers, kernel_workgroup_size, get_x87_volatile_option
+from. import release_cl_buffers, kernel_workgroup_size, get_x87_volatile_option, get_program
 
 
 class Separator(OpenclProcessing):
@@ -87,11 +88,25 @@ class Separator(OpenclProcessing):
             default_compiler_options = get_x87_volatile_option(self.ctx)
         self.compile_kernels(compile_options=default_compiler_options)
         if block_size is None:
-            self.block_size = kernel_workgroup_size(self.program, "filter_vertical")
+            self.block_size = kernel_workgroup_size(self.program, self.kernels.filter_vertical)
         else:
-            self.block_size = min(block_size, kernel_workgroup_size(self.program, "filter_vertical"))
+            self.block_size = min(block_size, kernel_workgroup_size(self.program, self.kernels.filter_vertical))
         self.set_kernel_arguments()
 
+    def compile_kernels(self, kernel_files=None, compile_options=None):
+        """Call the OpenCL compiler, unless the program was already built in this context
+
+        A new Separator is created each time the shape of the data changes.
+
+        :param kernel_files: list of path to the kernel
+            (by default use the one declared in the class)
+        :param compile_options: string of compile options
+        """
+        kernel_files = kernel_files or self.kernel_files
+        compile_options = compile_options or self.get_compiler_options()
+        self.program = get_program(self.ctx, kernel_files, compile_options)
+        self.kernels = KernelContainer(self.program)
+
     def __repr__(self):
         lst = ["OpenCL implementation of sort/median_filter/trimmed_mean"]
         return os.linesep.join(lst)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# coding: utf-8
+#
+#    Project: pyFAI
+#             https://github.com/silx-kit/pyFAI
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+
+
+"""
+Test of the OpenCL local maximum search used in blob detection
+"""
+
+__authors__ = ["Jérôme Kieffer"]
+__contact__ = "jerome.kieffer@esrf.eu"
+__license__ = "MIT"
+__copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
+__date__ = "15/10/2026"
+
+import logging
+import numpy
+import unittest
+from .. import ocl
+from ...test.utilstest import UtilsTest
+from ...blob_detection import local_max, BlobDetection, image_test
+
+logger = logging.getLogger(__name__)
+
+
+@unittest.skipIf(UtilsTest.opencl is False, "User request to skip OpenCL tests")
+@unittest.skipUnless(ocl, "PyOpenCl is missing")
+class TestLocalMax(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        from scipy.ndimage import gaussian_filter
+        rng = numpy.random.default_rng(0)
+        cls.dogs = gaussian_filter(rng.random((5, 97, 111)), (0, 1.5, 1.5)).astype(numpy.float32)
+        cls.mask = (rng.random(cls.dogs.shape[1:]) > 0.95).astype(numpy.int8)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.dogs = cls.mask = None
+
+    def test_local_max(self):
+        from ..blob import OCL_LocalMax
+        olm = OCL_LocalMax(self.dogs.shape)
+        for n_5 in (False, True):
+            for mask in (None, self.mask):
+                ref = local_max(self.dogs, mask, n_5)
+                obt = olm.local_max(self.dogs, mask, n_5)
+                self.assertTrue(ref.any(), "some maxima are found")
+                self.assertTrue(numpy.all(ref == obt), f"same maxima found with n_5={n_5}, mask={mask is not None}")
+
+    def test_mask_modified_in_place(self):
+        from ..blob import OCL_LocalMax
+        olm = OCL_LocalMax(self.dogs.shape)
+        mask = self.mask.copy()
+        olm.local_max(self.dogs, mask)
+        mask[:, :mask.shape[1] // 2] = 1
+        ref = local_max(self.dogs, mask, False)
+        obt = olm.local_max(self.dogs, mask)
+        self.assertTrue(numpy.all(ref == obt), "updated mask is taken into account")
+
+    def test_blob_detection(self):
+        img = image_test()
+        ref = BlobDetection(img)
+        ref.process(max_octave=3)
+        obt = BlobDetection(img, use_opencl=True)
+        obt.process(max_octave=3)
+        self.assertTrue(obt.use_opencl, "OpenCL was actually used")
+        self.assertEqual(len(obt._ocl_local_max), 3, "one OpenCL search per octave")
+        self.assertEqual(len(ref.raw_kp), len(obt.raw_kp))
+        for ref_kp, obt_kp in zip(ref.raw_kp, obt.raw_kp):
+            for r, o in zip(ref_kp, obt_kp):
+                self.assertTrue(numpy.all(r == o), "same raw keypoints")
+
+
+def suite():
+    loader = unittest.defaultTestLoader.loadTestsFromTestCase
+    testSuite = unittest.TestSuite()
+    testSuite.addTest(loader(TestLocalMax))
+    return testSuite
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest="suite")
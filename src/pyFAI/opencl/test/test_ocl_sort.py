@@ -28,12 +28,14 @@
 """Test for OpenCL sorting on GPU"""
 
 __license__ = "MIT"
-__date__ = "10/01/2022"
+__date__ = "15/10/2026"
 __copyright__ = "2015-2021, ESRF, Grenoble"
 __contact__ = "jerome.kieffer@esrf.fr"
 
 import unittest
 import numpy
+import gc
+import weakref
 import logging
 import warnings
 
@@ -216,6 +218,22 @@ class TestOclSort(unittest.TestCase):
             s.log_profile()
             s.reset_timer()
 
+    def test_program_cache(self):
+        s = ocl_sort.Separator(self.shape[0], self.shape[1], profile=self.PROFILE)
+        t = ocl_sort.Separator(self.shape[1], self.shape[0], ctx=s.ctx, profile=self.PROFILE)
+        self.assertIs(s.program, t.program, "program is built once per context")
+        self.assertIsNot(s.kernels.filter_vertical, t.kernels.filter_vertical, "kernels are not shared")
+
+    def test_program_cache_release(self):
+        import pyopencl
+        # Default contexts are cached for the whole process: use a private one
+        ctx = pyopencl.Context(devices=ocl.create_context().devices)
+        s = ocl_sort.Separator(self.shape[0], self.shape[1], ctx=ctx, profile=self.PROFILE)
+        ctx = weakref.ref(ctx)
+        del s
+        gc.collect()
+        self.assertIsNone(ctx(), "context and its programs are released")
+
 
 def suite():
     testsuite = unittest.TestSuite()
@@ -0,0 +1,88 @@
+/*
+ *   Project: Blob detection.
+ *            OpenCL Kernels
+ *
+ *
+ *   Copyright (C) 2026-2026 European Synchrotron Radiation Facility
+ *                           Grenoble, France
+ *
+ *   Principal authors: J. Kieffer (kieffer@esrf.fr)
+ *   Last revision: 15/10/2026
+ *
+ * Permission is hereby granted, free of charge, to any person obtaining a copy
+ * of this software and associated documentation files (the "Software"), to deal
+ * in the Software without restriction, including without limitation the rights
+ * to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+ * copies of the Software, and to permit persons to whom the Software is
+ * furnished to do so, subject to the following conditions:
+ *
+ * The above copyright notice and this permission notice shall be included in
+ * all copies or substantial portions of the Software.
+ *
+ * THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ * IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+ * FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+ * AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+ * LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+ * OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+ * THE SOFTWARE.
+ */
+
+
+#include "for_eclipse.h"
+
+/* Search for local maxima in a stack of difference of gaussians
+ *
+ * A point is a maximum when it is strictly larger than all its neighbors
+ * in a (2*half_size+1)x(2*half_size+1) patch of the current, previous and
+ * next DoG, and larger or equal than the same pixel in previous and next DoG.
+ * The comparison stops at the first failure, which rejects most pixels after
+ * a couple of reads. Pixels in the first/last DoG, too close to the border of
+ * the image or masked are never maxima.
+ *
+ * dogs: the stack of DoG, shape (depth, height, width)
+ * mask: array of int8 with non-zero for masked pixels, shape (height, width)
+ * do_mask: set to 0 to ignore the mask
+ * is_max: output array of int8, same shape as dogs
+ * depth, height, width: dimensions of the stack
+ * half_size: 1 for a 3x3 neighborhood, 2 for a 5x5
+ *
+ * Work-group size: any, 3D grid of size (width, height, depth) rounded up
+ */
+
+kernel void local_max(global const float *dogs,
+                      global const char  *mask,
+                      const char          do_mask,
+                      global char        *is_max,
+                      const int           depth,
+                      const int           height,
+                      const int           width,
+                      const int           half_size)
+{
+    int x = get_global_id(0);
+    int y = get_global_id(1);
+    int s = get_global_id(2);
+    if ((x >= width) || (y >= height) || (s >= depth))
+        return;
+
+    int frame = height * width;
+    int pos = s * frame + y * width + x;
+    char m = 0;
+
+    if ((s > 0) && (s < depth - 1) &&
+        (x >= half_size) && (x < width - half_size) &&
+        (y >= half_size) && (y < height - half_size) &&
+        !(do_mask && mask[y * width + x])) {
+        float c = dogs[pos];
+        m = (c >= dogs[pos - frame]) && (c >= dogs[pos + frame]);
+        for (int dy = -half_size; m && (dy <= half_size); dy++) {
+            for (int dx = -half_size; m && (dx <= half_size); dx++) {
+                if (dy || dx) {
+                    int p = pos + dy * width + dx;
+                    m = (c > dogs[p]) && (c > dogs[p - frame]) && (c > dogs[p + frame]);
+                }
+            }
+        }
+    }
+    is_max[pos] = m;
+}
@@ -32,7 +32,7 @@ __authors__ = ["Jérôme Kieffer"]
 __contact__ = "jerome.kieffer@esrf.eu"
 __license__ = "MIT"
 __copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
-__date__ = "06/10/2023"
+__date__ = "15/10/2026"
 
 import sys
 import unittest
@@ -85,6 +85,7 @@ from . import test_sparse_builder
 from . import test_goniometer
 from . import test_integrate_app
 from . import test_integrate_config
+from . import test_diffmap
 from . import test_pyfai_api
 from ..opencl import test as test_opencl
 from ..gui import test as test_gui
@@ -114,6 +115,7 @@ def suite():
     testsuite.addTest(test_integrate.suite())
     testsuite.addTest(test_integrate_app.suite())
     testsuite.addTest(test_integrate_config.suite())
+    testsuite.addTest(test_diffmap.suite())
     testsuite.addTest(test_bilinear.suite())
     testsuite.addTest(test_distortion.suite())
     testsuite.addTest(test_flat.suite())
@@ -32,7 +32,7 @@ __author__ = "Jérôme Kieffer"
 __contact__ = "Jérôme.Kieffer@esrf.fr"
 __license__ = "MIT"
 __copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
-__date__ = "16/10/2020"
+__date__ = "15/10/2026"
 
 import unittest
 import numpy
@@ -83,6 +83,22 @@ class TestConvolution(unittest.TestCase):
         obt = _convolution.gaussian_filter(self.lena, self.sigma)
         self.assertTrue(numpy.allclose(ref, obt), "gaussian filtered images are the same")
 
+    def test_gaussian_filter_output(self):
+        ref = _convolution.gaussian_filter(self.lena, self.sigma)
+        out = numpy.full_like(self.lena, numpy.nan)
+        obt = _convolution.gaussian_filter(self.lena, self.sigma, output=out)
+        self.assertTrue(numpy.shares_memory(obt, out), "result is written in the provided buffer")
+        self.assertTrue(numpy.allclose(ref, out), "gaussian filtered images are the same")
+
+    def test_gaussian_filter_tmp(self):
+        ref = _convolution.gaussian_filter(self.lena, self.sigma)
+        out = numpy.full_like(self.lena, numpy.nan)
+        tmp = numpy.full_like(self.lena, numpy.nan)
+        obt = _convolution.gaussian_filter(self.lena, self.sigma, output=out, tmp=tmp)
+        self.assertTrue(numpy.shares_memory(obt, out), "result is written in the provided buffer")
+        self.assertTrue(numpy.allclose(ref, out), "gaussian filtered images are the same")
+        self.assertTrue(numpy.isfinite(tmp).all(), "horizontal pass is written in the scratch buffer")
+
 
 def suite():
     loader = unittest.defaultTestLoader.loadTestsFromTestCase
@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+# coding: utf-8
+#
+#    Project: Azimuthal integration
+#             https://github.com/silx-kit/pyFAI
+#
+#    Copyright (C) 2026-2026 European Synchrotron Radiation Facility, Grenoble, France
+#
+#    Principal author:       Jérôme Kieffer (Jerome.Kieffer@ESRF.eu)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"Test suite for diffraction mapping"
+
+__author__ = "Jérôme Kieffer"
+__contact__ = "Jerome.Kieffer@ESRF.eu"
+__license__ = "MIT"
+__copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
+__date__ = "15/10/2026"
+
+import unittest
+import logging
+import os
+import shutil
+import tempfile
+import numpy
+import fabio
+import h5py
+
+from .utilstest import UtilsTest
+from ..azimuthalIntegrator import AzimuthalIntegrator
+from ..detectors import Detector
+from ..diffmap import DiffMap
+from ..worker import Worker
+
+logger = logging.getLogger(__name__)
+
+
+class TestDiffMap(unittest.TestCase):
+    """Scan of 3 rows of 4 points, the last row being incomplete"""
+    NPT_FAST = 4
+    NPT_SLOW = 3
+    NPT_RAD = 20
+    NFILES = 10
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tempDir = tempfile.mkdtemp(prefix=cls.__name__, dir=UtilsTest.tempdir)
+        detector = Detector(1e-4, 1e-4, max_shape=(40, 50))
+        cls.ai = AzimuthalIntegrator(dist=0.1, poni1=0.002, poni2=0.0025,
+                                     detector=detector, wavelength=1e-10)
+        rng = numpy.random.default_rng(0)
+        cls.images = [rng.poisson(100, detector.shape).astype(numpy.float32)
+                      for _ in range(cls.NFILES)]
+        cls.files = []
+        for i, data in enumerate(cls.images):
+            filename = os.path.join(cls.tempDir, "img_%04i.edf" % i)
+            fabio.edfimage.EdfImage(data=data).write(filename)
+            cls.files.append(filename)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tempDir)
+        cls.tempDir = cls.ai = cls.images = cls.files = None
+
+    def create_diffmap(self, npt_azim=None, output_dtype=None, npt_rad=NPT_RAD):
+        diffmap = DiffMap(npt_fast=self.NPT_FAST, npt_slow=self.NPT_SLOW,
+                          npt_rad=npt_rad, npt_azim=npt_azim)
+        diffmap.inputfiles = self.files
+        diffmap.worker = Worker(self.ai, shapeOut=(npt_azim or 1, npt_rad), unit="2th_deg")
+        diffmap.worker.method = ("bbox", "csr", "cython")
+        diffmap.hdf5 = os.path.join(self.tempDir, "%s.h5" % self.id())
+        if output_dtype is not None:
+            diffmap.output_dtype = output_dtype
+        return diffmap
+
+    def get_expected(self, npt_azim=None, npt_rad=NPT_RAD):
+        """Integrate each image independently"""
+        worker = Worker(self.ai, shapeOut=(npt_azim or 1, npt_rad), unit="2th_deg")
+        worker.method = ("bbox", "csr", "cython")
+        worker.output = "raw"
+        shape = (self.NPT_SLOW, self.NPT_FAST) + ((npt_azim,) if npt_azim else ()) + (npt_rad,)
+        expected = numpy.full(shape, numpy.nan, dtype=numpy.float32)
+        for i, data in enumerate(self.images):
+            expected[divmod(i, self.NPT_FAST)] = worker.process(data).intensity
+        return expected
+
+    def read_results(self, filename):
+        with h5py.File(filename, "r") as h5:
+            paths = []
+            h5.visit(paths.append)
+            intensity = h5[[p for p in paths if p.endswith("result/intensity")][0]]
+            vds = h5[[p for p in paths if p.endswith("result/map")][0]]
+            return intensity[()], vds[()]
+
+    def check_results(self, filename, expected, rtol=1e-6):
+        intensity, vds = self.read_results(filename)
+        self.assertEqual(intensity.shape, expected.shape)
+        numpy.testing.assert_allclose(intensity, expected, rtol=rtol, equal_nan=True)
+        self.assertTrue(numpy.isnan(intensity[-1, self.NFILES % self.NPT_FAST:]).all(), "missing points are empty")
+        # The map has the scan dimensions last
+        numpy.testing.assert_array_equal(vds, numpy.moveaxis(intensity, (0, 1), (-2, -1)))
+        return intensity
+
+    def test_to_tuple(self):
+        self.assertEqual(DiffMap.to_tuple("slice06/IRIS4_1_14749.edf"), (6, 4, 1, 14749))
+        # Trailing digits are taken into account
+        self.assertEqual(DiffMap.to_tuple("data.0010"), (10,))
+        names = ["data.0010", "data.0002", "data.0001"]
+        self.assertEqual(sorted(names, key=DiffMap.to_tuple), ["data.0001", "data.0002", "data.0010"])
+
+    def test_process_1d(self):
+        diffmap = self.create_diffmap()
+        diffmap.process()
+        self.check_results(diffmap.hdf5, self.get_expected())
+
+    def test_process_2d(self):
+        diffmap = self.create_diffmap(npt_azim=8)
+        diffmap.process()
+        self.check_results(diffmap.hdf5, self.get_expected(npt_azim=8))
+
+    def test_process_1d_few_bins(self):
+        """The map is built per radial bin when they are fewer than scan points"""
+        diffmap = self.create_diffmap(npt_rad=5)
+        diffmap.process()
+        self.check_results(diffmap.hdf5, self.get_expected(npt_rad=5))
+
+    def test_process_2d_few_bins(self):
+        """The map is built per bin when they are fewer than scan points"""
+        diffmap = self.create_diffmap(npt_azim=2, npt_rad=5)
+        diffmap.process()
+        self.check_results(diffmap.hdf5, self.get_expected(npt_azim=2, npt_rad=5))
+
+    def test_output_dtype(self):
+        diffmap = self.create_diffmap(output_dtype="float16")
+        diffmap.process()
+        intensity = self.check_results(diffmap.hdf5, self.get_expected(), rtol=1e-3)
+        self.assertEqual(intensity.dtype, numpy.float16)
+
+    def test_flush_partial_row(self):
+        """Results of an incomplete row are written by flush, as in the GUI"""
+        diffmap = self.create_diffmap()
+        diffmap.makeHDF5()
+        diffmap.init_ai()
+        expected = self.get_expected()
+        for filename in self.files[:2]:
+            diffmap.process_one_file(filename)
+        diffmap.flush()
+        row = diffmap.dataset[0]
+        numpy.testing.assert_allclose(row[:2], expected[0, :2], rtol=1e-6)
+        self.assertTrue(numpy.isnan(row[2:]).all(), "not yet processed")
+        for filename in self.files[2:]:
+            diffmap.process_one_file(filename)
+        diffmap.flush()
+        diffmap.nxs.close()
+        self.check_results(diffmap.hdf5, expected)
+
+    def test_makehdf5_drops_pending_row(self):
+        """A new dataset with another shape does not reuse the former row buffer"""
+        diffmap = self.create_diffmap()
+        diffmap.makeHDF5()
+        diffmap.init_ai()
+        diffmap.process_one_file(self.files[0])
+        diffmap.nxs.close()
+
+        other = self.create_diffmap(npt_rad=5)
+        diffmap.npt_rad = other.npt_rad
+        diffmap.worker = other.worker
+        diffmap.hdf5 = os.path.join(self.tempDir, "%s_other.h5" % self.id())
+        diffmap.makeHDF5()
+        diffmap.init_ai()
+        diffmap._idx = -1
+        for filename in self.files:
+            diffmap.process_one_file(filename)
+        diffmap.flush()
+        diffmap.nxs.close()
+        self.check_results(diffmap.hdf5, self.get_expected(npt_rad=5))
+
+
+def suite():
+    loader = unittest.defaultTestLoader.loadTestsFromTestCase
+    testsuite = unittest.TestSuite()
+    testsuite.addTest(loader(TestDiffMap))
+    return testsuite
+
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner()
+    runner.run(suite())
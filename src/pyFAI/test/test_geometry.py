@@ -34,7 +34,7 @@ __author__ = "Jérôme Kieffer"
 __contact__ = "Jerome.Kieffer@ESRF.eu"
 __license__ = "MIT"
 __copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
-__date__ = "13/12/2023"
+__date__ = "15/10/2026"
 
 import unittest
 import random
@@ -514,6 +514,20 @@ class TestGeometry(utilstest.ParametricTestCase):
         self.assertAlmostEqual(g.wavelength, 1e-10, msg="energy conversion works", delta=1e-13)
         self.assertAlmostEqual(g.energy, 12.4, 10, msg="energy conversion is stable")
 
+    def test_reset_on_change(self):
+        ai = AzimuthalIntegrator(dist=0.1, poni1=0.02, poni2=0.03, detector="Pilatus100k", wavelength=1e-10)
+        img = numpy.ones(ai.detector.shape, dtype=numpy.float32)
+        for key in ("dist", "poni1", "poni2", "rot1", "rot2", "rot3"):
+            ai.integrate1d(img, 100, method=("bbox", "csr", "cython"))
+            self.assertTrue(ai.engines, "an engine was built")
+            self.assertTrue(ai._cached_array, "arrays are cached")
+            setattr(ai, key, getattr(ai, key))
+            self.assertTrue(ai.engines, f"setting the same {key} keeps the engines")
+            self.assertTrue(ai._cached_array, f"setting the same {key} keeps the cached arrays")
+            setattr(ai, key, getattr(ai, key) + 0.001)
+            self.assertFalse(ai.engines, f"changing {key} resets the engines")
+            self.assertFalse(ai._cached_array, f"changing {key} resets the cached arrays")
+
 
 class TestCalcFrom(unittest.TestCase):
     """
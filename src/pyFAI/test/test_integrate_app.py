@@ -28,10 +28,13 @@
 
 import json
 import os
+import contextlib
 import fabio
 import unittest
+from unittest import mock
 import numpy
 import shutil
+import tempfile
 import h5py
 
 import pyFAI.app.integrate
@@ -41,6 +44,13 @@ from pyFAI.io import integration_config
 
 class TestIntegrateApp(unittest.TestCase):
 
+    @classmethod
+    def setUpClass(cls):
+        config = {"poni": UtilsTest.getimage("dummy.poni")}
+        integration_config.normalize(config, inplace=True)
+        cls.base_config = config
+        cls.json_cache = {}
+
     def setUp(self):
         self.tempDir = os.path.join(UtilsTest.tempdir, self.id())
         os.makedirs(self.tempDir)
@@ -85,19 +95,30 @@ class TestIntegrateApp(unittest.TestCase):
         path = os.path.join(self.tempDir, filename)
         return os.path.exists(path)
 
-    def create_json(self, ponipath=None, nbpt_azim=1):
+    def render_json(self, ponipath=None, nbpt_azim=1):
         if ponipath is None:
-            ponipath = UtilsTest.getimage("dummy.poni")
-        data = {"poni": ponipath}
-        integration_config.normalize(data, inplace=True)
+            data = self.base_config.copy()
+        else:
+            data = {"poni": ponipath}
+            integration_config.normalize(data, inplace=True)
         data["wavelength"] = 1
         data["nbpt_rad"] = 3
         data["nbpt_azim"] = nbpt_azim
         data["do_2D"] = nbpt_azim > 1
         data["method"] = ("bbox", "histogram", "cython")
+        return json.dumps(data)
+
+    def create_json(self, ponipath=None, nbpt_azim=1):
+        if ponipath is None:
+            # The default configurations are rendered once per class
+            text = self.json_cache.get(nbpt_azim)
+            if text is None:
+                text = self.json_cache[nbpt_azim] = self.render_json(nbpt_azim=nbpt_azim)
+        else:
+            text = self.render_json(ponipath, nbpt_azim)
         path = os.path.join(self.tempDir, "config.json")
         with open(path, 'w') as fp:
-            json.dump(data, fp)
+            fp.write(text)
         return path
 
     def create_h5_cube_file(self, filename, datapath, data, monitor=None):
@@ -349,13 +370,18 @@ class TestProcess(unittest.TestCase):
         config = {"poni": UtilsTest.getimage("dummy.poni")}
         integration_config.normalize(config, inplace=True)
         cls.base_config = config
+        # Each test gets its own directory, all of them are removed at once
+        cls.rootDir = tempfile.mkdtemp(prefix=cls.__name__, dir=UtilsTest.tempdir)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.rootDir)
+        cls.rootDir = None
 
     def setUp(self):
-        self.tempDir = os.path.join(UtilsTest.tempdir, self.id())
-        os.makedirs(self.tempDir)
+        self.tempDir = tempfile.mkdtemp(dir=self.rootDir)
 
     def tearDown(self):
-        shutil.rmtree(self.tempDir)
         self.tempDir = None
 
     def test_process_no_data(self):
@@ -419,6 +445,36 @@ class TestProcess(unittest.TestCase):
         numpy.testing.assert_array_almost_equal(result.radial, expected_radial, decimal=1)
         numpy.testing.assert_array_almost_equal(result.azimuthal, expected_azimuthal, decimal=1)
 
+    def test_process_error_h5(self):
+        """Frames buffered by the HDF5 writer are saved when processing fails"""
+
+        class FailingObserver(_ResultObserver):
+
+            def data_result(self, data_id, result):
+                super(FailingObserver, self).data_result(data_id, result)
+                if len(self.result) == 3:
+                    raise RuntimeError("Simulated failure")
+
+        data = numpy.random.random((5, 3, 2))
+        params = {"do_2D": False,
+                  "nbpt_rad": 2,
+                  "method": ("bbox", "histogram", "cython")}
+        config = self.base_config.copy()
+        config.update(params)
+        observer = FailingObserver()
+        output = os.path.join(self.tempDir, "output.h5")
+        with self.assertRaises(RuntimeError):
+            pyFAI.app.integrate.process([data], output, config, monitor_name=None, observer=observer)
+        self.assertEqual(len(observer.result), 3)
+        with h5py.File(output, "r") as h5:
+            datasets = []
+            h5.visititems(lambda name, obj: datasets.append(obj[()]) if name.endswith("results/data") else None)
+            self.assertEqual(len(datasets), 1)
+            stored = datasets[0]
+        self.assertEqual(len(stored), 3)
+        for result, intensity in zip(observer.result, stored):
+            numpy.testing.assert_array_almost_equal(result.intensity, intensity)
+
     def test_fabio_integration1d(self):
         data = numpy.array([[0, 0], [0, 100], [0, 0]])
         data = fabio.numpyimage.NumpyImage(data=data)
@@ -470,6 +526,47 @@ class TestProcess(unittest.TestCase):
         pyFAI.app.integrate.process(["##unexisting_file##.edf", 10], self.tempDir, config, monitor_name=None, observer=observer)
         self.assertEqual(len(observer.result), 0)
 
+    def test_list_existing_files(self):
+        existing = os.path.join(self.tempDir, "existing.edf")
+        fabio.edfimage.EdfImage(data=numpy.zeros((2, 2))).write(existing)
+        os.makedirs(os.path.join(self.tempDir, "directory.edf"))
+        filenames = [existing,
+                     os.path.join(self.tempDir, "directory.edf"),
+                     os.path.join(self.tempDir, "missing.edf"),
+                     os.path.join(self.tempDir, "missing_dir", "missing.edf")]
+        result = pyFAI.app.integrate.list_existing_files(filenames)
+        self.assertEqual(result, {existing})
+
+        # Enough files in the same directory to list it
+        batch = [os.path.join(self.tempDir, f"frame_{i:04d}.edf")
+                 for i in range(pyFAI.app.integrate.MIN_FILES_TO_LIST_DIRECTORY)]
+        for filename in batch[1:]:
+            fabio.edfimage.EdfImage(data=numpy.zeros((2, 2))).write(filename)
+        result = pyFAI.app.integrate.list_existing_files(filenames + batch)
+        self.assertEqual(result, {existing, *batch[1:]})
+
+        # Names which differ from the listing are checked one by one
+        with mock.patch.object(os, "scandir", return_value=contextlib.nullcontext(iter([]))):
+            result = pyFAI.app.integrate.list_existing_files(filenames + batch)
+        self.assertEqual(result, {existing, *batch[1:]})
+
+    def test_process_h5_data_path(self):
+        path = os.path.join(self.tempDir, "cube.h5")
+        with h5py.File(path, "w") as h5:
+            h5["data"] = numpy.random.random((2, 3, 2))
+        params = {"do_2D": False,
+                  "nbpt_rad": 2,
+                  "method": ("bbox", "histogram", "cython")}
+        config = self.base_config.copy()
+        config.update(params)
+        observer = _ResultObserver()
+        items = [path + "::/data", path + "::/missing"]
+        output = os.path.join(self.tempDir, "output.h5")
+        with mock.patch.object(fabio, "open", wraps=fabio.open) as fabio_open:
+            pyFAI.app.integrate.process(items, output, config, monitor_name=None, observer=observer)
+        self.assertEqual(len(observer.result), 2)
+        self.assertEqual(fabio_open.call_count, len(items), "each input is opened once")
+
     def test_normalization_monitor_name(self):
         data = numpy.array([[0, 0], [0, 100], [0, 0]])
         header = {"monitor": 0.5}
@@ -489,6 +586,25 @@ class TestProcess(unittest.TestCase):
         numpy.testing.assert_array_almost_equal(result.intensity, expected_result, decimal=1)
         numpy.testing.assert_array_almost_equal(result.radial, expected_radial, decimal=1)
 
+    def test_normalization_monitor_name_multiframe(self):
+        data = numpy.array([[[0, 0], [0, 100], [0, 0]]] * 3)
+        header = {"monitor": 0.5}
+        params = {"do_2D": False,
+                  "nbpt_rad": 2,
+                  "method": ("bbox", "histogram", "cython")}
+        config = self.base_config.copy()
+        config.update(params)
+        reference = _ResultObserver()
+        pyFAI.app.integrate.process([data[0]], self.tempDir, config, monitor_name=None, observer=reference)
+        data = fabio.numpyimage.NumpyImage(data=data, header=header)
+        config["monitor_name"] = "monitor"
+        observer = _ResultObserver()
+        pyFAI.app.integrate.process([data], self.tempDir, config, monitor_name=None, observer=observer)
+        self.assertEqual(len(observer.result), 3)
+        expected_result = reference.result[0].intensity / 0.5
+        for result in observer.result:
+            numpy.testing.assert_array_almost_equal(result.intensity, expected_result, decimal=3)
+
     def test_normalization_factor_monitor_name(self):
         data = numpy.array([[0, 0], [0, 100], [0, 0]])
         header = {"monitor": 0.5}
@@ -515,18 +631,12 @@ class TestMain(unittest.TestCase):
     def callable(self, *args, **kwargs):
         pass
 
-    def setUp(self):
-        self._gui = pyFAI.app.integrate.integrate_gui
-        self._shell = pyFAI.app.integrate.integrate_shell
-        pyFAI.app.integrate.integrate_gui = self.callable
-        pyFAI.app.integrate.integrate_shell = self.callable
-
-    def tearDown(self):
-        pyFAI.app.integrate.integrate_gui = self._gui
-        pyFAI.app.integrate.integrate_shell = self._shell
-
     def test(self):
-        pyFAI.app.integrate._main(["myimage.edf"])
+        # Patching is scoped to the test, which keeps the module untouched
+        # for other tests running in the same process
+        with mock.patch.object(pyFAI.app.integrate, "integrate_gui", self.callable), \
+             mock.patch.object(pyFAI.app.integrate, "integrate_shell", self.callable):
+            pyFAI.app.integrate._main(["myimage.edf"])
 
 
 def suite():
@@ -32,7 +32,7 @@ __author__ = "Jérôme Kieffer"
 __contact__ = "Jerome.Kieffer@ESRF.eu"
 __license__ = "MIT"
 __copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
-__date__ = "10/10/2023"
+__date__ = "15/10/2026"
 
 import unittest
 import os
@@ -202,6 +202,43 @@ class TestHDF5Writer(unittest.TestCase):
         statinfo = os.stat(h5file)
         self.assertTrue(statinfo.st_size / 1e6 > nmbytes, "file size (%s) is larger than dataset" % statinfo.st_size)
 
+    def test_buffered_append(self):
+        h5file = os.path.join(self.tmpdir, "buffered.h5")
+        npt = 100
+        n = 25
+        data = UtilsTest.get_rng().random((n, npt)).astype(numpy.float32)
+        writer = io.HDF5Writer(filename=h5file, hpath="data", append_frames=True)
+        writer.MAXIMUM_WRITE_BUFFER_SIZE = 10 * data[0].nbytes
+        writer.init({"nbpt_rad": npt})
+        for i in range(n - 1):
+            writer.write(data[i])
+        # non consecutive frame
+        writer.write(data[n - 1], n + 1)
+        writer.close()
+        with h5py.File(h5file, "r") as h5:
+            result = h5[writer.hpath + "/integrate/results/data"][()]
+        self.assertEqual(result.shape, (n + 2, npt))
+        self.assertTrue(numpy.array_equal(result[:n - 1], data[:n - 1]), "consecutive frames are written")
+        self.assertTrue(numpy.array_equal(result[n + 1], data[n - 1]), "last frame is written")
+
+    def test_compression(self):
+        try:
+            import hdf5plugin
+        except ImportError:
+            self.skipTest("hdf5plugin is not available")
+        h5file = os.path.join(self.tmpdir, "compressed.h5")
+        data = UtilsTest.get_rng().random((5, 100)).astype(numpy.float32)
+        compression = hdf5plugin.Blosc2(cname="lz4", clevel=3, filters=hdf5plugin.Blosc2.SHUFFLE)
+        writer = io.HDF5Writer(filename=h5file, hpath="data", append_frames=True, compression=compression)
+        writer.init({"nbpt_rad": 100})
+        for frame in data:
+            writer.write(frame)
+        writer.close()
+        with h5py.File(h5file, "r") as h5:
+            dataset = h5[writer.hpath + "/integrate/results/data"]
+            self.assertIn(str(hdf5plugin.BLOSC2_ID), dataset._filters)
+            self.assertTrue(numpy.array_equal(dataset[()], data), "data are preserved")
+
 
 class TestFabIOWriter(unittest.TestCase):
     """TODO finish !"""